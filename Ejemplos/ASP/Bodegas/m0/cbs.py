@@ -0,0 +1,359 @@
+'''Conflict-based search (CBS) for Bodegas instances, without grounding.
+
+    Usage: python3 cbs.py bodegas.lp [--bound N] > config.js
+
+    Reads the facts of an instance (rangeX/1, rangeY/1, obstacle/2, robot/1,
+    on/4 at time 0, goal/3 and #const bound) from a .lp file, with ranges
+    such as obstacle(1,1..6), and plans the routes of all the robots with
+    the same rules as bodegas.lp: in each time step a robot moves up, down,
+    left, right or waits, and two robots may neither be on the same cell
+    at the same time (vertex conflict) nor swap their cells in one step
+    (swap conflict). Every robot must be on its goal at the end.
+
+    The high level of CBS searches a tree of sets of constraints, cheapest
+    (sum of the arrival times of the robots) first. Each node plans every
+    robot on its own, with the constraints of the robot, and if two plans
+    conflict it is split in two nodes, each forbidding the conflict to one
+    of the two robots. The low level is a space-time A* run with the
+    SearchEngine of Tareas/Tarea2/sliders, whose states are (x, y, time).
+
+    Ties are broken by conflicts at both levels: among nodes of the same
+    cost the high level expands first those whose routes have fewer
+    conflicts, and among routes of the same cost the low level returns one
+    with few conflicts with the current routes of the other robots. This
+    keeps the solution optimal and cuts the nodes expanded when many of
+    them have the same cost.
+
+    CBS is fast when robots rarely meet, but each conflict doubles the
+    nodes of the tree, so it is slow when robots have to cross in narrow
+    corridors (e.g., bodegas1.lp, where clingo is the better choice).
+
+    The result is written with write_config of process.py, so robot.html
+    shows it as it shows the answers of clingo.
+'''
+
+import argparse
+import heapq
+import itertools
+import os
+import re
+import sys
+from collections import deque
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', '..', 'Tareas', 'Tarea2', 'sliders'))
+from search import *
+import process
+
+#Facts of an instance, as (predicate, arguments). Rules have variables, so they do not match.
+_FACT = re.compile(r'^\s*(rangeX|rangeY|obstacle|robot|on|goal)\(([-\d\s,.]*)\)\s*\.', re.MULTILINE)
+_BOUND = re.compile(r'#const\s+bound\s*=\s*(\d+)\s*\.')
+
+#Actions of bodegas.lp, as (name, dx, dy).
+_MOVES = (('up', 0, 1), ('down', 0, -1), ('left', -1, 0), ('right', 1, 0), ('wait', 0, 0))
+
+
+class Warehouse:
+    def __init__(self):
+        '''
+        A Bodegas instance.
+        self.rangeX, self.rangeY: the values of rangeX/1 and rangeY/1, in order.
+        self.obstacles: the [x, y] of each obstacle/2, in order.
+        self.robots: the robots, in order.
+        self.start, self.goal: robot -> (x, y) of its on/4 at time 0 and of its goal/3.
+        self.bound: the last time step (#const bound), or None.
+        '''
+        self.rangeX = []
+        self.rangeY = []
+        self.obstacles = []
+        self.robots = []
+        self.start = {}
+        self.goal = {}
+        self.bound = None
+
+    def free(self):
+        '''The set of cells a robot may be on.'''
+        blocked = set(map(tuple, self.obstacles))
+        return set((x, y) for x in self.rangeX for y in self.rangeY if (x, y) not in blocked)
+
+
+def _expand(term):
+    '''The integers of a term of a fact: a number or a range a..b.'''
+    if '..' in term:
+        first, last = term.split('..')
+        return list(range(int(first), int(last) + 1))
+    return [int(term)]
+
+
+def read_instance(path):
+    '''Reads the facts of the instance in the .lp file path and returns its Warehouse.'''
+    with open(path) as f:
+        text = re.sub(r'%.*', '', f.read())
+    warehouse = Warehouse()
+    for predicate, args in _FACT.findall(text):
+        for values in itertools.product(*[_expand(term.strip()) for term in args.split(',')]):
+            if predicate == 'rangeX':
+                warehouse.rangeX.append(values[0])
+            elif predicate == 'rangeY':
+                warehouse.rangeY.append(values[0])
+            elif predicate == 'obstacle':
+                warehouse.obstacles.append(list(values))
+            elif predicate == 'robot':
+                warehouse.robots.append(values[0])
+            elif predicate == 'on':
+                if values[3] == 0:
+                    warehouse.start[values[0]] = values[1:3]
+            else:
+                warehouse.goal[values[0]] = values[1:3]
+    bound = _BOUND.search(text)
+    if bound:
+        warehouse.bound = int(bound.group(1))
+    return warehouse
+
+
+class _Agent:
+    def __init__(self, free, goal, bound, constraints, others):
+        '''
+        The low level problem of one robot.
+        @param free: the set of cells a robot may be on.
+        @param goal: the goal cell of the robot.
+        @param bound: the last time step.
+        @param constraints: (x, y, t) forbidding the cell (x, y) at time t, and
+                            (x, y, nx, ny, t) forbidding the move from (x, y) at
+                            time t to (nx, ny) at time t+1.
+        @param others: the routes of the other robots, to count conflicts with.
+        '''
+        self.goal = goal
+        self.bound = bound
+        self.constraints = constraints
+        #cells and moves of the other robots, and the time from which each one stays on its goal
+        self.occupied = set()
+        self.moves = set()
+        self.parked = {}
+        for path in others:
+            for t, (x, y) in enumerate(path):
+                self.occupied.add((x, y, t))
+                if t > 0 and path[t - 1] != (x, y):
+                    self.moves.add(path[t - 1] + (x, y, t - 1))
+            self.parked[path[-1]] = len(path) - 1
+        #the robot can stay on its goal once it is not forbidden any more
+        self.last_goal_constraint = max([c[2] for c in constraints if len(c) == 3 and c[:2] == goal] + [-1])
+        #distances to the goal ignoring the other robots, an admissible heuristic
+        self.distance = {goal: 0}
+        queue = deque([goal])
+        while queue:
+            x, y = queue.popleft()
+            for _, dx, dy in _MOVES:
+                cell = (x + dx, y + dy)
+                if cell in free and cell not in self.distance:
+                    self.distance[cell] = self.distance[(x, y)] + 1
+                    queue.append(cell)
+
+    def conflicts(self, x, y, nx, ny, t):
+        '''Number of conflicts of moving from (x, y) at time t to (nx, ny) with the other robots.'''
+        parked = self.parked.get((nx, ny))
+        vertex = (nx, ny, t + 1) in self.occupied or (parked is not None and parked <= t + 1)
+        return vertex + ((nx, ny, x, y, t) in self.moves)
+
+
+class MoveState(StateSpace):
+    def __init__(self, action, gval, parent, agent, x, y, t, conflicts=0):
+        '''
+        A robot on the cell (x, y) at time t.
+        @param agent: the _Agent being planned.
+        @param conflicts: number of conflicts with the other robots on the way.
+        '''
+        StateSpace.__init__(self, action, gval, parent)
+        self.agent = agent
+        self.x = x
+        self.y = y
+        self.t = t
+        self.conflicts = conflicts
+
+    def successors(self):
+        '''The cells the robot may be on at time t+1 without breaking a constraint, nor getting away from its goal for good.'''
+        agent = self.agent
+        t = self.t + 1
+        successors = []
+        if t > agent.bound:
+            return successors
+        for action, dx, dy in _MOVES:
+            x, y = self.x + dx, self.y + dy
+            if (x, y) not in agent.distance or (x, y, t) in agent.constraints or \
+               (self.x, self.y, x, y, self.t) in agent.constraints:
+                continue
+            conflicts = self.conflicts + agent.conflicts(self.x, self.y, x, y, self.t)
+            successors.append(MoveState(action, self.gval + 1, self, agent, x, y, t, conflicts))
+        return successors
+
+    def hashable_state(self):
+        return (self.x, self.y, self.t)
+
+    def print_state(self):
+        print("ACTION was " + self.action)
+        print("({}, {}) at time {}".format(self.x, self.y, self.t))
+
+
+def _at_goal(state):
+    agent = state.agent
+    return (state.x, state.y) == agent.goal and state.t > agent.last_goal_constraint
+
+def _heuristic(state):
+    agent = state.agent
+    return max(agent.distance[(state.x, state.y)], agent.last_goal_constraint + 1 - state.t)
+
+def _fval(sN):
+    #gval + hval, plus less than 1 growing with the conflicts: costs are integers,
+    #so conflicts only break ties between nodes of the same fval
+    conflicts = sN.state.conflicts
+    return sN.gval + sN.hval + conflicts/(conflicts + 1.)
+
+
+def plan_robot(warehouse, free, robot, constraints, bound, timebound=None, others=()):
+    '''
+    The cheapest route of robot that satisfies constraints (see _Agent), as
+    the list of its cells at times 0, 1, ..., up to its arrival at its goal
+    to stay, or None if there is none until time bound. Among the cheapest
+    routes it prefers those with fewer conflicts with the routes in others.
+    '''
+    agent = _Agent(free, warehouse.goal[robot], bound, constraints, others)
+    x, y = warehouse.start[robot]
+    if (x, y) not in agent.distance:
+        return None
+    se = SearchEngine('custom', 'full')
+    #gval is the time, so every path to a state has the same gval; the first
+    #one extracted has the fewest conflicts, and so do its continuations
+    se.skip_duplicates_on()
+    se.init_search(MoveState("START", 0, None, agent, x, y, 0), _at_goal, _heuristic, _fval)
+    final = se.search(timebound=timebound)
+    if not final:
+        return None
+    path = []
+    while final:
+        path.append((final.x, final.y))
+        final = final.parent
+    path.reverse()
+    return path
+
+
+def _position(path, t):
+    #a robot stays on its goal after arriving
+    return path[t] if t < len(path) else path[-1]
+
+def conflicts(paths):
+    '''
+    Yields the conflicts between the routes in paths (robot -> list of
+    cells), by time: (robot1, robot2, x, y, t) if both are on (x, y) at time
+    t, and (robot1, robot2, x, y, nx, ny, t) if robot1 moves from (x, y) to
+    (nx, ny) while robot2 moves from (nx, ny) to (x, y), from time t to t+1.
+    '''
+    robots = list(paths)
+    horizon = max(len(path) for path in paths.values())
+    for t in range(horizon):
+        seen = {}
+        for robot in robots:
+            cell = _position(paths[robot], t)
+            if cell in seen:
+                yield (seen[cell], robot) + cell + (t,)
+            else:
+                seen[cell] = robot
+        if t + 1 == horizon:
+            break
+        moves = {}
+        for robot in robots:
+            here, there = _position(paths[robot], t), _position(paths[robot], t + 1)
+            if here != there:
+                other = moves.get((there, here))
+                if other is not None:
+                    yield (other, robot) + there + here + (t,)
+                moves[(here, there)] = robot
+
+def first_conflict(paths):
+    '''The first conflict (see conflicts) between the routes in paths, or None.'''
+    return next(conflicts(paths), None)
+
+
+def cbs(warehouse, bound=None, timebound=None):
+    '''
+    Plans the routes of all the robots of warehouse with conflict-based
+    search, minimizing the sum of their arrival times, and returns them as
+    robot -> list of cells at times 0, 1, ..., or None if there is no
+    solution until time bound (by default, that of the instance).
+    @param timebound: the maximum amount of time, in seconds, of each low level search.
+    '''
+    if bound is None:
+        bound = warehouse.bound
+    free = warehouse.free()
+    constraints = dict((robot, frozenset()) for robot in warehouse.robots)
+    paths = {}
+    for robot in warehouse.robots:
+        paths[robot] = plan_robot(warehouse, free, robot, constraints[robot], bound, timebound, list(paths.values()))
+        if paths[robot] is None:
+            return None
+
+    counter = itertools.count()
+    cost = sum(len(path) - 1 for path in paths.values())
+    open = [(cost, sum(1 for _ in conflicts(paths)), next(counter), constraints, paths)]
+    while open:
+        cost, _, _, constraints, paths = heapq.heappop(open)
+        conflict = first_conflict(paths)
+        if conflict is None:
+            return paths
+        robot1, robot2 = conflict[:2]
+        if len(conflict) == 5:
+            x, y, t = conflict[2:]
+            forbidden = [(robot1, (x, y, t)), (robot2, (x, y, t))]
+        else:
+            x, y, nx, ny, t = conflict[2:]
+            forbidden = [(robot1, (x, y, nx, ny, t)), (robot2, (nx, ny, x, y, t))]
+        for robot, constraint in forbidden:
+            child = dict(constraints)
+            child[robot] = constraints[robot] | {constraint}
+            others = [path for other, path in paths.items() if other != robot]
+            path = plan_robot(warehouse, free, robot, child[robot], bound, timebound, others)
+            if path is None:
+                continue
+            child_paths = dict(paths)
+            child_paths[robot] = path
+            heapq.heappush(open, (cost - len(paths[robot]) + len(path), sum(1 for _ in conflicts(child_paths)),
+                                  next(counter), child, child_paths))
+    return None
+
+
+def to_plan(warehouse, paths):
+    '''The process.Plan of the routes in paths, with every robot on its goal until the last arrival.'''
+    plan = process.Plan()
+    for x in warehouse.rangeX:
+        plan.add('rangeX', [x])
+    for y in warehouse.rangeY:
+        plan.add('rangeY', [y])
+    for obstacle in warehouse.obstacles:
+        plan.add('obstacle', list(obstacle))
+    for robot in warehouse.robots:
+        plan.add('goal', [robot, warehouse.goal[robot][0], warehouse.goal[robot][1]])
+    horizon = max(len(path) for path in paths.values())
+    for robot in warehouse.robots:
+        for t in range(horizon):
+            x, y = _position(paths[robot], t)
+            plan.add('on', [robot, x, y, t])
+    return plan
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Plan the robots of a Bodegas instance with conflict-based search and write config.js to stdout.')
+    parser.add_argument('instance', help='.lp file with the facts of the instance')
+    parser.add_argument('--bound', type=int, default=None, help='last time step (default: #const bound of the instance)')
+    parser.add_argument('--timebound', type=float, default=None, help='seconds for each low level search')
+    args = parser.parse_args(argv)
+
+    warehouse = read_instance(args.instance)
+    bound = args.bound if args.bound is not None else warehouse.bound
+    if bound is None:
+        sys.exit("No bound given, and no #const bound in " + args.instance)
+    paths = cbs(warehouse, bound, args.timebound)
+    if paths is None:
+        sys.exit("No solution until time {}".format(bound))
+    process.write_config(to_plan(warehouse, paths), sys.stdout)
+
+
+if __name__ == "__main__":
+    main()
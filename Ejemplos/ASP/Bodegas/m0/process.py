@@ -1,103 +1,224 @@
+'''Turns the output of clingo on bodegas.lp into config.js for robot.html.
+
+    Usage: clingo bodegas.lp [-n 0] | python3 process.py [--models models.js] > config.js
+
+    Each answer line is read in chunks and its atoms are matched with one
+    regular expression in a single pass, grouping the on/4 atoms by robot,
+    so memory and time grow linearly with the size of an answer. parse
+    returns the Plan of the best answer, which other tools can use
+    directly, and write_config writes a Plan as config.js one line at a
+    time.
+
+    clingo may print several answers, e.g., when enumerating models or
+    improving the cost of an optimization. They are read one at a time and
+    only the best one is kept: the one with the lowest Optimization values
+    and, among equals, the last one. So memory does not grow with the
+    number of answers. With --models every answer is also written to one
+    line of models.js as soon as it is read, config.js names that file, and
+    robot.html loads it and lets you go through them.
+'''
+
+import argparse
+import json
+import re
 import sys
 
-lines = sys.stdin.readlines()
-
-init=0
-while "on(" not in lines[init]:
-    init+=1
-
-atoms = lines[init].split(" ")
-
-obstacles=[]
-
-rangoX=[]
-rangoY=[]
-
-
-for line in atoms:
-    if line[0:6] != "rangeX":
-        continue
-    line=line.replace("rangeX","")
-    line=line.replace("(","")
-    line=line.replace(")","")
-    rangoX.append(int(line))
-
-for line in atoms:
-    if line[0:6] != "rangeY":
-        continue
-    line=line.replace("rangeY","")
-    line=line.replace("(","")
-    line=line.replace(")","")
-    rangoY.append(int(line))
-
-
-for line in atoms:
-    if line[0:3] != "obs":
-        continue
-    line=line.replace("obstacle","")
-    line=line.replace("(","")
-    line=line.replace(")","")
-    tup = line.split(",")
-    obstacles.append([int(tup[0]),int(tup[1])])
-
-en = []
-for line in atoms:
-    if line[0:3] != "on(":
-        continue
-    line=line.replace("on(","")
-    line=line.replace(")","")
-    tup = line.split(",")
-    en.append([int(tup[0])-1,int(tup[1]),int(tup[2]),int(tup[3])])
-
-objectives=[]
-for line in atoms:
-    if line[0:3] != "goa":
-        continue
-    line=line.replace("goal","")
-    line=line.replace("(","")
-    line=line.replace(")","")
-    tup = line.split(",")
-    objectives.append([int(tup[0])-1,int(tup[1]),int(tup[2])])
-
-robots=[]
-for t in en:
-    if t[0] not in robots:
-        robots.append(t[0])
-
-times=[]
-for t in en:
-    if t[3] not in times:
-        times.append(t[3])
-times.sort()
-
-en.sort(key=lambda x:x[3])
-en.sort(key=lambda x:x[0])
-
-pos={}
-
-for r in robots:
-    pos['rob_'+str(r)] = [];
-
-for t in en:
-    pos['rob_'+str(t[0])].append([t[1],t[2]])
-
-
-print('var xrange;');
-print('var yrange;');
-print('xrange=',max(rangoX),';');
-print('yrange=',max(rangoY),';');
-
-print('var objectives;')
-print('objectives=',objectives)
-print('var obstacles;')
-print('obstacles=',obstacles)
-
-print('var pos=[];')
-i=0
-for r in robots:
-    print('pos['+str(i)+']=',pos['rob_'+str(r)],';')
-    i+=1
-
-print('var events=[]')
-for t in times:
-    print('events['+str(t)+']=',[[r,x,y] for [r,x,y,time] in en if time==t])
+#Atoms used by config.js, as (predicate, arguments); not the end of a longer name, like subgoal(...).
+_ATOM = re.compile(r'(?<!\w)(rangeX|rangeY|obstacle|goal|on)\(([-\d,]*)\)')
+
+#Start of the line before each answer, and of the line with its costs.
+_ANSWER = 'Answer:'
+_OPTIMIZATION = 'Optimization:'
+
+#Characters read at once from a (maybe very long) line of clingo's output.
+_CHUNK = 1 << 16
+
+
+class Plan:
+    def __init__(self):
+        '''
+        The atoms of one answer of bodegas.lp. Robots are numbered from 0
+        (from 1 in the program).
+        self.rangeX, self.rangeY: the values of rangeX/1 and rangeY/1.
+        self.obstacles: [x, y] of each obstacle/2.
+        self.goals: [robot, x, y] of each goal/3.
+        self.on: robot -> list of [time, x, y] of its on/4 atoms, with the
+                 robots in order of appearance in the answer.
+        '''
+        self.rangeX = []
+        self.rangeY = []
+        self.obstacles = []
+        self.goals = []
+        self.on = {}
+
+    def add(self, predicate, args):
+        '''Adds the atom predicate(args), args being its integer arguments.'''
+        if predicate == 'on':
+            self.on.setdefault(args[0] - 1, []).append([args[3], args[1], args[2]])
+        elif predicate == 'rangeX':
+            self.rangeX.append(args[0])
+        elif predicate == 'rangeY':
+            self.rangeY.append(args[0])
+        elif predicate == 'obstacle':
+            self.obstacles.append(args)
+        else:
+            self.goals.append([args[0] - 1, args[1], args[2]])
+
+    def robots(self):
+        '''The robots, in order of appearance in the answer.'''
+        return list(self.on)
+
+    def times(self):
+        '''The sorted time steps with some on/4 atom.'''
+        return sorted(set(t for steps in self.on.values() for t, x, y in steps))
+
+    def path(self, robot):
+        '''The [x, y] positions of robot, sorted by time.'''
+        return [[x, y] for t, x, y in sorted(self.on[robot], key=lambda step: step[0])]
+
+    def events(self):
+        '''time -> list of [robot, x, y] of the robots at that time, by robot number.'''
+        events = dict((t, []) for t in self.times())
+        for robot in sorted(self.on):
+            for t, x, y in sorted(self.on[robot], key=lambda step: step[0]):
+                events[t].append([robot, x, y])
+        return events
+
+
+def _add_atoms(plan, text):
+    for predicate, args in _ATOM.findall(text):
+        plan.add(predicate, [int(a) for a in args.split(',')])
+
+
+def _read_answer(stream, plan, head=''):
+    '''Adds to plan the atoms of the rest of the current line of stream, which starts with head.'''
+    tail = head
+    while not tail.endswith('\n'):
+        piece = stream.readline(_CHUNK)
+        if not piece:
+            break
+        text = tail + piece
+        #an atom may continue in the next piece, keep it for later
+        cut = text.rfind(' ') + 1
+        _add_atoms(plan, text[:cut])
+        tail = text[cut:]
+    _add_atoms(plan, tail)
+
+
+def _read_head(stream):
+    '''Reads the start of the next line of stream (the whole line if it is short), '' at the end.'''
+    piece = stream.readline(_CHUNK)
+    while piece and len(piece) < len(_OPTIMIZATION) and not piece.endswith('\n'):
+        piece = piece + stream.readline(_CHUNK)
+    return piece
+
+
+def _skip_line(stream, piece):
+    '''Reads the rest of the line that starts with piece.'''
+    while piece and not piece.endswith('\n'):
+        piece = stream.readline(_CHUNK)
+
+
+def answers(stream):
+    '''
+    Reads clingo's output from stream and yields (number, costs, plan) for
+    each answer, as soon as it is read: its number, the values of its
+    Optimization line (None if there is none) and its Plan. If clingo
+    prints no Answer: lines (e.g., with -V0), each line with atoms is an
+    answer, numbered from 1.
+    '''
+    numbered = False
+    unnumbered = 0
+    head = _read_head(stream)
+    while head:
+        plan = Plan()
+        if head.startswith(_ANSWER):
+            numbered = True
+            number = int(head.split()[1])
+            _skip_line(stream, head)
+            _read_answer(stream, plan)
+        elif not numbered and _ATOM.search(head):
+            unnumbered = unnumbered + 1
+            number = unnumbered
+            _read_answer(stream, plan, head)
+        else:
+            _skip_line(stream, head)
+            head = _read_head(stream)
+            continue
+        costs = None
+        head = _read_head(stream)
+        if head.startswith(_OPTIMIZATION):
+            costs = [int(c) for c in head[len(_OPTIMIZATION):].split()]
+            _skip_line(stream, head)
+            head = _read_head(stream)
+        yield number, costs, plan
+
+
+def parse(stream, models=None):
+    '''
+    Reads clingo's output from stream and returns the Plan of its best
+    answer, or None if there is none. Costs are compared as clingo does
+    (lexicographically, lower is better) and ties go to the last answer, so
+    without optimization it is the last answer. If models is given, every
+    answer is also written to it (see write_model).
+    '''
+    best = best_costs = None
+    for index, (number, costs, plan) in enumerate(answers(stream)):
+        if models is not None:
+            if index == 0:
+                print('var models=[];', file=models)
+            write_model(index, number, costs, plan, models)
+        if best is None or costs is None or best_costs is None or costs <= best_costs:
+            best, best_costs = plan, costs
+    return best
+
+
+def write_config(plan, out):
+    '''Writes plan to out as config.js.'''
+    print('var xrange;', file=out)
+    print('var yrange;', file=out)
+    print('xrange=', max(plan.rangeX), ';', file=out)
+    print('yrange=', max(plan.rangeY), ';', file=out)
+
+    print('var objectives;', file=out)
+    print('objectives=', plan.goals, file=out)
+    print('var obstacles;', file=out)
+    print('obstacles=', plan.obstacles, file=out)
+
+    print('var pos=[];', file=out)
+    for i, robot in enumerate(plan.robots()):
+        print('pos['+str(i)+']=', plan.path(robot), ';', file=out)
+
+    print('var events=[]', file=out)
+    for t, events in sorted(plan.events().items()):
+        print('events['+str(t)+']=', events, file=out)
+
+
+def write_model(index, number, costs, plan, out):
+    '''Writes the answer number of clingo (with its costs) to out as the line models[index]={...}; of models.js.'''
+    events = plan.events()
+    steps = [events.get(t, []) for t in range(max(events) + 1)] if events else []
+    model = {'answer': number, 'costs': costs, 'events': steps}
+    print('models['+str(index)+']='+json.dumps(model, separators=(',', ':'))+';', file=out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Turn clingo's output on bodegas.lp (read from stdin) into config.js (written to stdout).")
+    parser.add_argument('--models', default=None, help='also write every answer to this file (e.g. models.js)')
+    args = parser.parse_args(argv)
+
+    if args.models:
+        with open(args.models, 'w') as models:
+            plan = parse(sys.stdin, models)
+    else:
+        plan = parse(sys.stdin)
+    if plan is None:
+        sys.exit("No answer found in clingo's output")
+    write_config(plan, sys.stdout)
+    if args.models:
+        #robot.html only loads the models file when config.js names it
+        print('var modelsfile=', json.dumps(args.models), ';')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+'''Checks Bodegas plans against the constraints of bodegas.lp.
+
+    Usage: clingo bodegas.lp -n 0 | python3 validate.py          (every answer)
+           python3 validate.py config.js [other.js ...] [--bound N]
+
+    A plan (a process.Plan, read from clingo's output or from a config.js
+    written by process.py or cbs.py) is loaded into a NumPy array of shape
+    (robots, time, 2) with the [x, y] of every robot at every time step,
+    and each rule of bodegas.lp is checked for all the robots and time
+    steps at once, giving a (robots, time) array of violations:
+    - missing: the robot has no on/4 atom at that time.
+    - range: the robot is outside rangeX/rangeY.
+    - obstacle: the robot is on an obstacle.
+    - step: the robot moves more than one cell in one step.
+    - collision: two robots are on the same cell.
+    - swap: two robots swap their cells in one step.
+    - goal: the robot is not on its goal at the bound.
+    Only the first violation of each robot (the earliest, and among those
+    of the same time the first one of the list above) is reported. Robots
+    are numbered from 1 in the reports, as in bodegas.lp.
+'''
+
+import argparse
+import json
+import re
+import sys
+
+import numpy as np
+
+import process
+
+#Kinds of violations, in the order they are checked.
+_KINDS = ('missing', 'range', 'obstacle', 'step', 'collision', 'swap', 'goal')
+
+#Lines of config.js with a value: name= value ; or name[index]= value
+_CONFIG_LINE = re.compile(r'^(\w+)(?:\[(\d+)\])?=\s*(.*?)\s*;?\s*$')
+
+
+class Violation:
+    def __init__(self, robot, time, kind, detail=''):
+        '''
+        The first violation of a robot.
+        @param robot: the robot, numbered from 0 as in process.Plan.
+        @param time: the time step of the violation (the first of the two for step and swap).
+        @param kind: one of _KINDS.
+        @param detail: a description of the violation.
+        '''
+        self.robot = robot
+        self.time = time
+        self.kind = kind
+        self.detail = detail
+
+    def __str__(self):
+        return "robot {} at time {}: {} {}".format(self.robot + 1, self.time, self.kind, self.detail).rstrip()
+
+
+def read_config(stream):
+    '''The Plan of a config.js written by process.py (ranges start at 0, as config.js only keeps their maximum).'''
+    plan = process.Plan()
+    for line in stream:
+        match = _CONFIG_LINE.match(line.strip())
+        if not match or match.group(3) == '[]':
+            continue
+        name, index, value = match.groups()
+        if name == 'xrange':
+            plan.rangeX = list(range(int(value) + 1))
+        elif name == 'yrange':
+            plan.rangeY = list(range(int(value) + 1))
+        elif name == 'objectives':
+            plan.goals = json.loads(value)
+        elif name == 'obstacles':
+            plan.obstacles = json.loads(value)
+        elif name == 'events':
+            for robot, x, y in json.loads(value):
+                plan.on.setdefault(robot, []).append([int(index), x, y])
+    return plan
+
+
+def plan_arrays(plan, horizon=None):
+    '''
+    Returns (robots, positions, present) for plan: the sorted list of its
+    robots, the (robots, time, 2) array of their [x, y] at times 0, 1, ...
+    up to the last time of the plan, and the (robots, time) boolean array of
+    the time steps with a position (the others are [0, 0] in positions).
+    @param horizon: the number of time steps of the arrays, if more than those of the plan.
+    '''
+    robots = sorted(plan.on)
+    #the [t, x, y] of all the robots, one after the other
+    atoms = np.array([step for robot in robots for step in plan.on[robot]], dtype=int).reshape(-1, 3)
+    owner = np.repeat(np.arange(len(robots)), [len(plan.on[robot]) for robot in robots])
+    horizon = max(atoms[:, 0].max() + 1 if len(atoms) else 0, horizon or 0)
+    positions = np.zeros((len(robots), horizon, 2), dtype=int)
+    present = np.zeros((len(robots), horizon), dtype=bool)
+    positions[owner, atoms[:, 0]] = atoms[:, 1:]
+    present[owner, atoms[:, 0]] = True
+    return robots, positions, present
+
+
+def _member(values, allowed):
+    '''Whether each of the integers in values is in allowed, looked up in a table from their minimum to their maximum.'''
+    low = values.min()
+    table = np.zeros(values.max() - low + 1, dtype=bool)
+    allowed = np.asarray(allowed, dtype=int) - low
+    table[allowed[(allowed >= 0) & (allowed < len(table))]] = True
+    return table[values - low]
+
+
+def _cells(positions):
+    '''A unique integer for each [x, y] in positions, and the number of integers used.'''
+    low = positions.reshape(-1, 2).min(axis=0) if positions.size else np.zeros(2, dtype=int)
+    span = positions.reshape(-1, 2).max(axis=0) - low + 1 if positions.size else np.ones(2, dtype=int)
+    shifted = positions - low
+    return shifted[..., 0]*span[1] + shifted[..., 1], int(span[0]*span[1])
+
+
+def violations(plan, bound=None):
+    '''
+    Checks plan and returns a dictionary kind -> (robots, time) boolean
+    array of the violations of that kind (see _KINDS), along with the
+    robots and positions of plan_arrays, as (robots, positions, violations).
+    @param bound: the time at which every robot must be on its goal (by default, the last time of the plan).
+    '''
+    robots, positions, present = plan_arrays(plan, None if bound is None else bound + 1)
+    count, horizon = present.shape
+    x, y = positions[..., 0], positions[..., 1]
+    found = dict((kind, np.zeros((count, horizon), dtype=bool)) for kind in _KINDS)
+    if count == 0:
+        return robots, positions, found
+
+    found['missing'] = ~present
+    inside = _member(x, plan.rangeX) & _member(y, plan.rangeY)
+    found['range'] = present & ~inside
+
+    if plan.obstacles:
+        obstacles = np.array(plan.obstacles, dtype=int).reshape(-1, 2)
+        low = np.minimum(obstacles.min(axis=0), positions.reshape(-1, 2).min(axis=0))
+        grid = np.zeros(np.maximum(obstacles.max(axis=0), positions.reshape(-1, 2).max(axis=0)) - low + 1, dtype=bool)
+        grid[obstacles[:, 0] - low[0], obstacles[:, 1] - low[1]] = True
+        found['obstacle'] = present & grid[x - low[0], y - low[1]]
+
+    both = present[:, :-1] & present[:, 1:]
+    moved = np.abs(positions[:, 1:] - positions[:, :-1]).sum(axis=2)
+    found['step'][:, :-1] = both & (moved > 1)
+
+    #collisions: robots next to each other, once sorted by cell, on the same cell
+    cells, size = _cells(positions)
+    cells = np.where(present, cells, -1 - np.arange(count)[:, None])
+    order = np.argsort(cells, axis=0, kind='stable')
+    ranked = np.take_along_axis(cells, order, axis=0)
+    same = ranked[1:] == ranked[:-1]
+    times = np.arange(horizon)
+    collision = found['collision']
+    collision[order[1:][same], np.broadcast_to(times, same.shape)[same]] = True
+    collision[order[:-1][same], np.broadcast_to(times, same.shape)[same]] = True
+
+    #swaps: robot a moves from here to there while the robot on there (if any) moves to here
+    keys = (np.arange(horizon)*size + cells)[present]
+    sort = np.argsort(keys, kind='stable')
+    keys, owners = keys[sort], np.nonzero(present)[0][sort]
+    here, there = cells[:, :-1], cells[:, 1:]
+    moving = np.nonzero(both & (here != there))
+    wanted = moving[1]*size + there[moving]
+    index = np.minimum(np.searchsorted(keys, wanted), len(keys) - 1)
+    other = owners[index]
+    swapped = (keys[index] == wanted) & (cells[other, moving[1] + 1] == here[moving])
+    found['swap'][moving[0][swapped], moving[1][swapped]] = True
+
+    if bound is None:
+        bound = horizon - 1
+    goals = dict((robot, (gx, gy)) for robot, gx, gy in plan.goals)
+    goal = np.array([goals.get(robot, (np.nan, np.nan)) for robot in robots], dtype=float)
+    found['goal'][:, bound] = ~present[:, bound] | (positions[:, bound] != goal).any(axis=1)
+    return robots, positions, found
+
+
+def first_violations(plan, bound=None):
+    '''The first Violation of each robot of plan that has one, by robot.'''
+    robots, positions, found = violations(plan, bound)
+    if not robots:
+        return {}
+    #(robots, kinds, time) array; the first True in time-major order is the first violation
+    stacked = np.stack([found[kind] for kind in _KINDS], axis=1)
+    flat = stacked.transpose(0, 2, 1).reshape(len(robots), -1)
+    bad = flat.any(axis=1)
+    first = flat.argmax(axis=1)
+    report = {}
+    for i in np.flatnonzero(bad):
+        time, kind = divmod(int(first[i]), len(_KINDS))
+        report[robots[i]] = Violation(robots[i], time, _KINDS[kind], _detail(robots, positions, i, time, _KINDS[kind]))
+    return report
+
+
+def _detail(robots, positions, i, time, kind):
+    '''Describes the violation of kind of the i-th robot at time.'''
+    cell = positions[i, time].tolist()
+    if kind == 'collision':
+        other = [robots[j] + 1 for j in range(len(robots)) if j != i and (positions[j, time] == positions[i, time]).all()]
+        return "with robot {} on {}".format(other[0], cell)
+    if kind == 'swap':
+        there = positions[i, time + 1]
+        other = [robots[j] + 1 for j in range(len(robots))
+                 if (positions[j, time] == there).all() and (positions[j, time + 1] == positions[i, time]).all()]
+        return "with robot {} between {} and {}".format(other[0], cell, there.tolist())
+    if kind == 'step':
+        return "from {} to {}".format(cell, positions[i, time + 1].tolist())
+    if kind in ('range', 'obstacle', 'goal'):
+        return "on {}".format(cell)
+    return ''
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Check Bodegas plans against the rules of bodegas.lp.')
+    parser.add_argument('configs', nargs='*', help='config.js files (by default, the answers of clingo read from stdin)')
+    parser.add_argument('--bound', type=int, default=None, help='time at which every robot must be on its goal (default: last time of each plan)')
+    args = parser.parse_args(argv)
+
+    if args.configs:
+        plans = []
+        for path in args.configs:
+            with open(path) as stream:
+                plans.append((path, read_config(stream)))
+    else:
+        plans = (("answer {}".format(number), plan) for number, costs, plan in process.answers(sys.stdin))
+
+    failed = 0
+    for name, plan in plans:
+        report = first_violations(plan, args.bound)
+        if report:
+            failed = failed + 1
+            print(name + ": invalid")
+            for robot in sorted(report):
+                print("  " + str(report[robot]))
+        else:
+            print(name + ": valid")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
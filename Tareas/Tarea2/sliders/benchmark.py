@@ -0,0 +1,363 @@
+'''Benchmark runner for the sliders problem sets.
+
+    Runs every problem of one or more PROBLEMS suites (problems.py in this
+    directory, and revision/problems.py) against every combination of the
+    given search strategies and heuristics, in a pool of worker processes
+    with a time bound per run. For each run it records the solution cost,
+    the search statistics of the engine (nodes expanded, states generated,
+    pruning counts, including the moves skipped with --move-pruning, stale
+    and duplicate nodes, peak sizes of OPEN and of the cycle check
+    dictionary), the wall and CPU time and the peak memory of
+    the worker, writes the table to a
+    CSV or JSON file, and optionally compares it with a stored baseline to
+    flag regressions. With --reference it also checks that every strategy
+    finds solutions as cheap as those of a reference strategy, e.g., that
+    hdastar, idastar or bidirectional_astar are as optimal as astar.
+
+    hdastar runs are not run in the pool, since they start their own
+    worker processes (--workers of them), which the processes of a pool
+    can not do. Each one runs on its own after the others, and its peak
+    memory is that of its largest process.
+
+    With --micro it instead measures, in this process, the expansions per
+    second of the fast search loop of SearchEngine and of the observed loop
+    (the one used when tracing, profiling or hooks are on) on each problem.
+
+    Example:
+        python3 benchmark.py --suites sliders revision --strategies astar custom:3 \\
+            --heuristics basic --timebound 10 --jobs 4 --output results.json \\
+            --baseline baseline.json
+        python3 benchmark.py --micro --problems 0-6 --strategies astar --heuristics basic
+        python3 benchmark.py --problems 0-8 --strategies astar hdastar --workers 4 --reference astar
+'''
+
+import argparse
+import csv
+import importlib.util
+import json
+import multiprocessing
+import os
+import queue
+import resource
+import sys
+import time
+
+from search import *
+from sliders import *
+import solution
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+
+#Problem suites, by name: path of the module defining PROBLEMS.
+SUITES = {
+    'sliders': os.path.join(_HERE, 'problems.py'),
+    'revision': os.path.join(_HERE, '..', 'revision', 'problems.py'),
+}
+
+#Heuristics, by name.
+HEURISTICS = {
+    'zero': solution.sliders_h_zero,
+    'basic': solution.sliders_h_basic,
+    'alternate': solution.sliders_h_alternate,
+}
+
+#Columns of the results table, in order.
+FIELDS = ['suite', 'problem', 'strategy', 'weight', 'heuristic', 'solved', 'cost',
+          'expanded', 'generated', 'cycle_check_pruned', 'cost_bound_pruned', 'successors_pruned', 'stale_pops',
+          'duplicate_pops', 'stale_avoided', 'peak_open', 'peak_cc_dictionary',
+          'wall_time', 'cpu_time', 'peak_memory_kb']
+
+
+def load_suite(name):
+    '''Returns the PROBLEMS tuple of a suite.'''
+    spec = importlib.util.spec_from_file_location(name + '_problems', SUITES[name])
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.PROBLEMS
+
+
+def parse_strategy(spec):
+    '''Splits a strategy spec such as 'astar' or 'custom:3' into (strategy, weight).'''
+    if ':' in spec:
+        strategy, weight = spec.split(':')
+        return strategy, float(weight)
+    return spec, None
+
+
+def run_one(task):
+    '''Runs a single (problem, configuration) pair and returns its row of results.
+       Meant to run in a fresh worker process, so the peak memory is the run's own.'''
+    suite, index, strategy, weight, heuristic, timebound, frontier, packed, workers, move_pruning = task
+    state = load_suite(suite)[index]
+    if packed:
+        state = sliders_packed_state(state)
+    heur_fn = HEURISTICS[heuristic]
+    SlidersState.move_pruning = move_pruning
+
+    se = SearchEngine(strategy, 'default', frontier)
+    se.set_workers(workers)
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    if weight is None:
+        se.init_search(state, sliders_goal_state, heur_fn)
+    else:
+        se.init_search(state, sliders_goal_state, heur_fn, (lambda sN: solution.fval_function(sN, weight)))
+    final = se.search(timebound=timebound)
+    wall_time = time.perf_counter() - wall_start
+    cpu_time = time.process_time() - cpu_start
+
+    row = {
+        'suite': suite,
+        'problem': index,
+        'strategy': strategy,
+        'weight': weight,
+        'heuristic': heuristic,
+        'solved': bool(final),
+        'cost': final.gval if final else None,
+    }
+    stats = se.stats.as_dict()
+    for field in FIELDS[7:-3]:
+        row[field] = stats[field]
+    row['wall_time'] = round(wall_time, 4)
+    row['cpu_time'] = round(cpu_time, 4)
+    row['peak_memory_kb'] = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                                resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return row
+
+
+def _run_to(task, results):
+    results.put(run_one(task))
+
+
+def _run_alone(task):
+    '''Runs a task (as run_one) in a process of its own, which may start processes, and returns its row.'''
+    results = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_run_to, args=(task, results))
+    process.start()
+    while True:
+        try:
+            row = results.get(timeout=1)
+            break
+        except queue.Empty:
+            if not process.is_alive() and results.empty():
+                raise RuntimeError("The run of {} failed with exit code {}".format(task, process.exitcode))
+    process.join()
+    return row
+
+
+def _expansion_rate(state, strategy, weight, heur_fn, timebound, frontier, observed):
+    '''(expansions, expansions per second) of one search of state'''
+    se = SearchEngine(strategy, 'default', frontier)
+    if observed:
+        #a hook that does nothing is enough to select the observed loop
+        se.set_hooks(on_expand=lambda node: None)
+    if weight is None:
+        se.init_search(state, sliders_goal_state, heur_fn)
+    else:
+        se.init_search(state, sliders_goal_state, heur_fn, (lambda sN: solution.fval_function(sN, weight)))
+    start = time.perf_counter()
+    se.search(timebound=timebound)
+    elapsed = time.perf_counter() - start
+    return se.stats.expanded, se.stats.expanded/elapsed if elapsed else 0.0
+
+
+def microbenchmark(tasks, repeat=3):
+    '''
+    Runs each task (as for run_one) with the fast and with the observed
+    search loop, repeat times each, and returns rows with the number of
+    expansions and the best expansions per second of each loop.
+    '''
+    rows = []
+    for suite, index, strategy, weight, heuristic, timebound, frontier, packed, workers, move_pruning in tasks:
+        state = load_suite(suite)[index]
+        if packed:
+            state = sliders_packed_state(state)
+        SlidersState.move_pruning = move_pruning
+        row = {'suite': suite, 'problem': index, 'strategy': strategy, 'weight': weight, 'heuristic': heuristic}
+        for loop, observed in [('fast', False), ('observed', True)]:
+            rates = [_expansion_rate(state, strategy, weight, HEURISTICS[heuristic], timebound, frontier, observed)
+                     for _ in range(repeat)]
+            row['expanded'] = rates[0][0]
+            row[loop] = max(rate for _, rate in rates)
+        row['speedup'] = row['fast']/row['observed'] if row['observed'] else None
+        rows.append(row)
+    return rows
+
+
+def run_matrix(tasks, jobs=None):
+    '''Runs all tasks in a pool of jobs processes (one process per run, except
+       for hdastar, see _run_alone) and returns their rows, sorted by suite,
+       problem and configuration.'''
+    pooled = [task for task in tasks if task[2] != 'hdastar']
+    with multiprocessing.Pool(processes=jobs, maxtasksperchild=1) as pool:
+        rows = list(pool.imap_unordered(run_one, pooled))
+    rows.extend(_run_alone(task) for task in tasks if task[2] == 'hdastar')
+    rows.sort(key=_row_key)
+    return rows
+
+
+def _row_key(row):
+    return (row['suite'], row['problem'], row['strategy'], row['weight'] or 0, row['heuristic'])
+
+
+def write_results(rows, path):
+    '''Writes rows to path, as JSON if it ends in .json and as CSV otherwise.'''
+    with open(path, 'w', newline='') as f:
+        if path.endswith('.json'):
+            json.dump(rows, f, indent=1)
+        else:
+            writer = csv.DictWriter(f, fieldnames=FIELDS)
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def read_results(path):
+    '''Reads a table written by write_results.'''
+    with open(path, newline='') as f:
+        if path.endswith('.json'):
+            return json.load(f)
+        rows = []
+        for row in csv.DictReader(f):
+            row['problem'] = int(row['problem'])
+            row['weight'] = float(row['weight']) if row['weight'] else None
+            row['solved'] = row['solved'] == 'True'
+            row['cost'] = float(row['cost']) if row['cost'] else None
+            for field in FIELDS[7:]:
+                #columns added after the file was written are left empty
+                row[field] = float(row[field]) if row.get(field) else None
+            rows.append(row)
+        return rows
+
+
+def _known(old, row, field):
+    '''Whether both rows have a value of field (a baseline written before a column was added has none).'''
+    return old.get(field) is not None and row.get(field) is not None
+
+
+def compare(rows, baseline, tolerance=0.1, time_tolerance=0.5):
+    '''
+    Compares rows with the baseline rows of the same problem and
+    configuration, and returns a list of (row, message) regressions: runs no
+    longer solved, more expensive solutions, and more nodes expanded or
+    states generated (by more than tolerance) or more CPU time (by more than
+    time_tolerance) than in the baseline. Fields without a value in either
+    row (e.g., columns added after the baseline was written) are skipped.
+    '''
+    base = dict((_row_key(row), row) for row in baseline)
+    regressions = []
+    for row in rows:
+        old = base.get(_row_key(row))
+        if old is None:
+            continue
+        if old['solved'] and not row['solved']:
+            regressions.append((row, 'no longer solved'))
+            continue
+        if not (old['solved'] and row['solved']):
+            continue
+        if _known(old, row, 'cost') and row['cost'] > old['cost']:
+            regressions.append((row, 'cost {} > {}'.format(row['cost'], old['cost'])))
+        for field in ['expanded', 'generated']:
+            if _known(old, row, field) and row[field] > old[field]*(1 + tolerance):
+                regressions.append((row, '{} {} > {}'.format(field, row[field], old[field])))
+        if _known(old, row, 'cpu_time') and row['cpu_time'] > old['cpu_time']*(1 + time_tolerance) and row['cpu_time'] - old['cpu_time'] > 0.05:
+            regressions.append((row, 'cpu_time {} > {}'.format(row['cpu_time'], old['cpu_time'])))
+    return regressions
+
+
+def check_costs(rows, reference='astar'):
+    '''
+    Compares the cost of each row with that of the row of the reference
+    strategy (without weight) on the same problem and heuristic, and returns
+    a list of (row, message) mismatches: runs solved by the reference but
+    not by the row's strategy, and solutions of a different cost. Meant to
+    check that strategies that should be optimal (e.g., hdastar with an
+    admissible heuristic) agree with astar.
+    '''
+    base = dict(((row['suite'], row['problem'], row['heuristic']), row) for row in rows
+                if row['strategy'] == reference and row['weight'] is None)
+    mismatches = []
+    for row in rows:
+        old = base.get((row['suite'], row['problem'], row['heuristic']))
+        if old is None or old is row or not old['solved']:
+            continue
+        if not row['solved']:
+            mismatches.append((row, 'not solved, {} cost {}'.format(reference, old['cost'])))
+        elif row['cost'] != old['cost']:
+            mismatches.append((row, 'cost {} != {} cost {}'.format(row['cost'], reference, old['cost'])))
+    return mismatches
+
+
+def _parse_problems(spec, count):
+    '''Problem indices from a spec such as '0-5,8', or all of them if spec is None.'''
+    if spec is None:
+        return list(range(count))
+    indices = []
+    for part in spec.split(','):
+        if '-' in part:
+            first, last = part.split('-')
+            indices.extend(range(int(first), int(last) + 1))
+        else:
+            indices.append(int(part))
+    return [i for i in indices if i < count]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the sliders problem suites against several search configurations.')
+    parser.add_argument('--suites', nargs='+', default=['sliders'], choices=sorted(SUITES))
+    parser.add_argument('--problems', default=None, help="indices to run, e.g. '0-5,8' (default: all)")
+    parser.add_argument('--strategies', nargs='+', default=['astar'], help="e.g. astar ucs custom:3 idastar")
+    parser.add_argument('--heuristics', nargs='+', default=['basic'], choices=sorted(HEURISTICS))
+    parser.add_argument('--frontier', default='lazy', choices=['lazy', 'indexed', 'bucket'])
+    parser.add_argument('--packed', action='store_true', help='use PackedSlidersState')
+    parser.add_argument('--move-pruning', action='store_true', help='skip redundant moves (see SlidersState.pruned_moves)')
+    parser.add_argument('--timebound', type=float, default=10)
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: one per core)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes of each hdastar run (default: one per core)')
+    parser.add_argument('--reference', default=None, help='strategy whose solution costs every other strategy must match (e.g. astar)')
+    parser.add_argument('--output', default='benchmark.json', help='.json or .csv file')
+    parser.add_argument('--baseline', default=None, help='results file to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.1)
+    parser.add_argument('--time-tolerance', type=float, default=0.5)
+    parser.add_argument('--micro', action='store_true', help='measure expansions per second of the search loops instead')
+    parser.add_argument('--repeat', type=int, default=3, help='runs of each loop with --micro')
+    args = parser.parse_args(argv)
+
+    tasks = []
+    for suite in args.suites:
+        for index in _parse_problems(args.problems, len(load_suite(suite))):
+            for spec in args.strategies:
+                strategy, weight = parse_strategy(spec)
+                for heuristic in args.heuristics:
+                    tasks.append((suite, index, strategy, weight, heuristic, args.timebound, args.frontier, args.packed,
+                                  args.workers, args.move_pruning))
+
+    if args.micro:
+        for row in microbenchmark(tasks, args.repeat):
+            print("{suite}[{problem}] {strategy} w={weight} h={heuristic}: expanded={expanded} "
+                  "fast={fast:.0f}/s observed={observed:.0f}/s speedup={speedup:.3f}".format(**row))
+        return 0
+
+    rows = run_matrix(tasks, args.jobs)
+    write_results(rows, args.output)
+    for row in rows:
+        print("{suite}[{problem}] {strategy} w={weight} h={heuristic}: cost={cost} expanded={expanded} "
+              "generated={generated} pruned={successors_pruned} cpu={cpu_time}s mem={peak_memory_kb}KB".format(**row))
+
+    failed = False
+    if args.reference:
+        mismatches = check_costs(rows, args.reference)
+        for row, message in mismatches:
+            print("MISMATCH {}[{}] {} w={} h={}: {}".format(
+                row['suite'], row['problem'], row['strategy'], row['weight'], row['heuristic'], message))
+        failed = failed or bool(mismatches)
+    if args.baseline:
+        regressions = compare(rows, read_results(args.baseline), args.tolerance, args.time_tolerance)
+        for row, message in regressions:
+            print("REGRESSION {}[{}] {} w={} h={}: {}".format(
+                row['suite'], row['problem'], row['strategy'], row['weight'], row['heuristic'], message))
+        failed = failed or bool(regressions)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+'''Pattern database heuristics for sliders.
+
+    A pattern database (PDB) tracks only a subset of the tiles (the pattern)
+    and blanks out the rest. The distance from every abstract board to the
+    abstract goal is computed once, with a breadth first search backwards from
+    the goal, and stored in a NumPy array indexed by a perfect rank of the
+    positions of the pattern tiles. Since every slide of the real board is
+    also a slide of the abstract board, these distances are admissible
+    estimates of the distance to the goal.
+
+    A) Class PatternDatabase
+
+    Builds (or loads from disk) the table of one pattern, and looks up the
+    distance of a sliders state.
+
+    B) sliders_h_pdb
+
+    Combines several pattern databases into a heuristic function that can be
+    given to SearchEngine.init_search as heur_fn.
+'''
+
+import os
+import numpy as np
+from sliders import *
+
+#Distances are stored as uint8, UNREACHED marks entries not yet reached by the BFS.
+_UNREACHED = 255
+
+#Number of abstract boards expanded at once by the vectorized BFS.
+_CHUNK = 1 << 16
+
+
+def _slide_maps(width, height):
+    '''Returns an array with one row per slide; row m maps each cell of the
+       board to the cell its tile is moved to by slide m.'''
+    cells = np.arange(width*height).reshape(height, width)
+    maps = []
+    for row in range(height):
+        for shift in (-1, 1):
+            moved = cells.copy()
+            moved[row, :] = np.roll(cells[row, :], shift)
+            maps.append(moved)
+    for column in range(width):
+        for shift in (-1, 1):
+            moved = cells.copy()
+            moved[:, column] = np.roll(cells[:, column], shift)
+            maps.append(moved)
+    #moved[cell] is the cell whose tile ends up in cell, invert it
+    slides = np.empty((len(maps), width*height), dtype=np.int64)
+    for m, moved in enumerate(maps):
+        slides[m, moved.reshape(-1)] = np.arange(width*height)
+    return slides
+
+
+def _rank_positions(positions, cells):
+    '''Perfect rank of each row of positions, a (m, k) array of distinct cells,
+       among the cells!/(cells-k)! sequences of k distinct cells.'''
+    rank = np.zeros(len(positions), dtype=np.int64)
+    for i in range(positions.shape[1]):
+        digit = positions[:, i].astype(np.int64)
+        for j in range(i):
+            digit = digit - (positions[:, j] < positions[:, i])
+        rank = rank*(cells - i) + digit
+    return rank
+
+
+class PatternDatabase:
+    def __init__(self, width, height, tiles, directory=None):
+        '''
+        Creates the pattern database of a board size and a set of tiles.
+        If directory is given the table is memory-mapped from the file for
+        this pattern in that directory, building and saving it first if the
+        file does not exist yet.
+        @param width: The board's X dimension.
+        @param height: The board's Y dimension.
+        @param tiles: The tiles tracked by the pattern.
+        @param directory: Where pattern databases are saved, or None.
+        '''
+        self.width = width
+        self.height = height
+        self.tiles = tuple(sorted(tiles))
+        self.cells = width*height
+        self.size = 1
+        for i in range(len(self.tiles)):
+            self.size = self.size*(self.cells - i)
+
+        if directory is None:
+            self.table = self.build()
+        else:
+            path = os.path.join(directory, self.filename())
+            if not os.path.exists(path):
+                os.makedirs(directory, exist_ok=True)
+                np.save(path, self.build())
+            self.table = np.load(path, mmap_mode='r')
+
+    def filename(self):
+        return "sliders_pdb_{}x{}_{}.npy".format(self.width, self.height, "-".join(str(t) for t in self.tiles))
+
+    def build(self):
+        '''Runs the backwards breadth first search from the abstract goal
+           and returns the table of distances.'''
+        if self.size >= 2**31:
+            raise ValueError("Pattern of {} tiles is too large for a {}x{} board.".format(
+                len(self.tiles), self.width, self.height))
+        slides = _slide_maps(self.width, self.height)
+        table = np.full(self.size, _UNREACHED, dtype=np.uint8)
+
+        #in the goal every tile t is on cell t
+        frontier = np.array([self.tiles], dtype=np.int64)
+        table[_rank_positions(frontier, self.cells)] = 0
+        depth = 0
+        while len(frontier) and depth + 1 < _UNREACHED:
+            depth = depth + 1
+            layer = []
+            for start in range(0, len(frontier), _CHUNK):
+                chunk = frontier[start:start + _CHUNK]
+                reached = slides[:, chunk].reshape(-1, chunk.shape[1])
+                rank = _rank_positions(reached, self.cells)
+                new = table[rank] == _UNREACHED
+                rank, index = np.unique(rank[new], return_index=True)
+                table[rank] = depth
+                layer.append(reached[new][index])
+            frontier = np.concatenate(layer)
+        return table
+
+    def rank(self, board):
+        '''Rank of the positions of the pattern tiles on a packed board.'''
+        positions = [board.index(t) for t in self.tiles]
+        rank = 0
+        for i, p in enumerate(positions):
+            digit = p
+            for q in positions[:i]:
+                if q < p:
+                    digit = digit - 1
+            rank = rank*(self.cells - i) + digit
+        return rank
+
+    def __call__(self, state):
+        '''Distance from the abstraction of state to the abstract goal.'''
+        return int(self.table[self.rank(state.hashable_state())])
+
+
+def sliders_h_pdb(pdbs, combine='max'):
+    '''
+    Returns a heuristic function (for SearchEngine.init_search) combining
+    the given pattern databases.
+    With combine='max' the heuristic is the largest of their distances,
+    which is always admissible. With combine='add' it is their sum, which
+    is more informed but not admissible in general: a single slide can move
+    tiles of several patterns at once, and is then counted by each of them.
+    '''
+    pdbs = list(pdbs)
+    if combine == 'max':
+        def heur_fn(state):
+            board = state.hashable_state()
+            return max(int(pdb.table[pdb.rank(board)]) for pdb in pdbs)
+    elif combine == 'add':
+        def heur_fn(state):
+            board = state.hashable_state()
+            return sum(int(pdb.table[pdb.rank(board)]) for pdb in pdbs)
+    else:
+        raise ValueError("combine must be 'max' or 'add', not {}".format(combine))
+
+    def batch(states):
+        #positions[i, t] is the cell of tile t on the i-th board
+        boards = sliders_stack(states).reshape(len(states), -1)
+        positions = np.argsort(boards, axis=1)
+        values = [pdb.table[_rank_positions(positions[:, pdb.tiles], pdb.cells)] for pdb in pdbs]
+        if combine == 'max':
+            return np.max(values, axis=0).tolist()
+        return np.sum(values, axis=0, dtype=int).tolist()
+    heur_fn.batch = batch
+    return heur_fn
@@ -0,0 +1,194 @@
+'''Parallel portfolio search for sliders problems.
+
+    It is hard to tell in advance which search configuration (astar,
+    best_first, custom with some weight, ...) will solve a problem fastest
+    under a time bound, so run_portfolio starts several configurations of
+    SearchEngine on the same problem, each in its own process, and returns
+    the first solution found (first=True) or the cheapest one found by the
+    deadline (first=False). The processes still running are then
+    terminated.
+
+    The workers share the cost of the best solution found so far (the
+    incumbent) in a multiprocessing.Value. Each worker reads it from an
+    on_expand hook (see SearchEngine.set_hooks) every _SYNC_EXPANSIONS
+    expansions and lowers the cost bound of its search, so nodes that can
+    not lead to a cheaper solution are pruned: those with gval no lower
+    than the incumbent, and, when the heuristic is admissible, those with
+    gval + hval no lower than it.
+
+    Workers send back the path of their solution as (key, action, gval)
+    triples, and the parent process rebuilds it with StateSpace.from_key.
+
+    Example:
+        python3 portfolio.py --problem 5 --configs astar best_first custom:2 custom:5 \\
+            --heuristic basic --timebound 10
+'''
+
+import argparse
+import multiprocessing
+import queue
+import sys
+import time
+
+from search import *
+from sliders import *
+import benchmark
+import solution
+
+#Expansions between two reads of the shared incumbent in each worker.
+_SYNC_EXPANSIONS = 256
+
+#Cost bounds are strict (a node is pruned if its cost is above the bound),
+#so the bound is set just below the incumbent.
+_COST_EPSILON = 1e-9
+
+
+class PortfolioResult:
+    def __init__(self, config, state, cost, elapsed, stats):
+        '''
+        The solution returned by run_portfolio.
+        @param config: the (strategy, weight) configuration that found it.
+        @param state: the goal state, with its path rebuilt (see print_path).
+        @param cost: its gval.
+        @param elapsed: seconds from the start of the portfolio until it was received.
+        @param stats: the SearchStats of the worker, as a dictionary.
+        '''
+        self.config = config
+        self.state = state
+        self.cost = cost
+        self.elapsed = elapsed
+        self.stats = stats
+
+    def __str__(self):
+        strategy, weight = self.config
+        return "{} w={}: cost={} in {:.3f}s (expanded={})".format(
+            strategy, weight, self.cost, self.elapsed, self.stats['expanded'])
+
+
+def _path_of(state):
+    '''The (key, action, gval) triples of the states on the path to state, from the initial one.'''
+    path = []
+    while state:
+        path.append((state.hashable_state(), state.action, state.gval))
+        state = state.parent
+    path.reverse()
+    return path
+
+
+def _rebuild(prototype, path):
+    '''The last state of a path of (key, action, gval) triples, built with prototype.from_key.'''
+    state = None
+    for key, action, gval in path:
+        state = prototype.from_key(key, action, gval, state)
+    return state
+
+
+def _worker(config, initState, goal_fn, heur_fn, admissible, timebound, incumbent, results):
+    '''Runs one configuration and puts (config, path, cost, stats) on results (path None if it failed).'''
+    strategy, weight = config
+    se = SearchEngine(strategy, 'default')
+    if weight is None:
+        se.init_search(initState, goal_fn, heur_fn)
+    else:
+        se.init_search(initState, goal_fn, heur_fn, (lambda sN: solution.fval_function(sN, weight)))
+
+    #the engine reads the bound list on every check, so it can be lowered during the search
+    bound = [float('inf')]*3
+    expansions = [0]
+
+    def sync(node):
+        expansions[0] = expansions[0] + 1
+        if expansions[0] % _SYNC_EXPANSIONS == 0:
+            best = incumbent.value - _COST_EPSILON
+            if best < bound[0]:
+                bound[0] = best
+                if admissible:
+                    bound[2] = best
+    se.set_hooks(on_expand=sync)
+
+    final = se.search(timebound=timebound, costbound=bound)
+    if final:
+        with incumbent.get_lock():
+            if final.gval < incumbent.value:
+                incumbent.value = final.gval
+        results.put((config, _path_of(final), final.gval, se.stats.as_dict()))
+    else:
+        results.put((config, None, None, se.stats.as_dict()))
+
+
+def run_portfolio(initState, goal_fn, configs, heur_fn=solution.sliders_h_zero, timebound=10, first=True, admissible=False):
+    '''
+    Searches initState with every configuration in configs in parallel and
+    returns a PortfolioResult, or None if no configuration found a solution
+    in time.
+    @param configs: (strategy, weight) pairs, with weight None unless the strategy is 'custom'.
+    @param heur_fn: the heuristic function of all the configurations.
+    @param timebound: the maximum amount of time, in seconds, to wait for the portfolio.
+    @param first: return the first solution found if True, else the cheapest one found by the deadline.
+    @param admissible: whether heur_fn is admissible, so the shared incumbent can also prune by gval + hval.
+    '''
+    incumbent = multiprocessing.Value('d', float('inf'))
+    results = multiprocessing.Queue()
+    start = time.perf_counter()
+    workers = [multiprocessing.Process(target=_worker, daemon=True,
+                                       args=(config, initState, goal_fn, heur_fn, admissible, timebound, incumbent, results))
+               for config in configs]
+    for worker in workers:
+        worker.start()
+
+    best = None
+    pending = len(workers)
+    try:
+        while pending:
+            remaining = timebound - (time.perf_counter() - start)
+            if remaining <= 0:
+                break
+            try:
+                config, path, cost, stats = results.get(timeout=remaining)
+            except queue.Empty:
+                break
+            pending = pending - 1
+            if path is None:
+                continue
+            if best is None or cost < best.cost:
+                best = PortfolioResult(config, _rebuild(initState, path), cost, time.perf_counter() - start, stats)
+            if first:
+                break
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        for worker in workers:
+            worker.join()
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Solve a sliders problem with a portfolio of search configurations run in parallel.')
+    parser.add_argument('--suite', default='sliders', choices=sorted(benchmark.SUITES))
+    parser.add_argument('--problem', type=int, default=0)
+    parser.add_argument('--configs', nargs='+', default=['astar', 'best_first', 'custom:2', 'custom:5'],
+                        help="e.g. astar best_first custom:3")
+    parser.add_argument('--heuristic', default='basic', choices=sorted(benchmark.HEURISTICS))
+    parser.add_argument('--admissible', action='store_true', help='also prune by gval + hval with the shared incumbent')
+    parser.add_argument('--packed', action='store_true', help='use PackedSlidersState')
+    parser.add_argument('--timebound', type=float, default=10)
+    parser.add_argument('--best', action='store_true', help='wait until the deadline for the cheapest solution')
+    args = parser.parse_args(argv)
+
+    state = benchmark.load_suite(args.suite)[args.problem]
+    if args.packed:
+        state = sliders_packed_state(state)
+    configs = [benchmark.parse_strategy(spec) for spec in args.configs]
+    result = run_portfolio(state, sliders_goal_state, configs, benchmark.HEURISTICS[args.heuristic],
+                           args.timebound, not args.best, args.admissible)
+    if result is None:
+        print("No solution found in {}s".format(args.timebound))
+        return 1
+    print(result)
+    result.state.print_path()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
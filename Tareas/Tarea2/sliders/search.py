@@ -18,6 +18,10 @@
       include information specific to that problem. See WaterJugs.py for an
       example, and the Class implementation for more details.
 
+      Problems that are to be solved with bidirectional search must also
+      supply their goal states and an inverse successor function (see the
+      goal_states and predecessors methods).
+
 
     B) class SearchEngine
 
@@ -37,13 +41,25 @@
       a goal is found (using searchOpen). See the implementation for details. 
 
     '''
+from array import array
+import copy
+import gzip
 import heapq
+import itertools
 from collections import deque
+import multiprocessing
 import os
+import pickle
+import queue
+import time
+import zlib
 
 class StateSpace:
     '''Abstract class for defining State spaces for search routines'''
     n = 0
+    #successors that a state class chose not to generate (e.g., by move
+    #pruning), counted by the class; reset by SearchEngine.initStats
+    successors_pruned = 0
     
     def __init__(self, action, gval, parent):
         '''Problem specific state space objects must always include the data items
@@ -74,13 +90,39 @@ class StateSpace:
            of the state represented by self. The return value, e.g., a
            string or tuple, will be used by hashing routines. So if obj1 and
            obj2, both StateSpace objects then obj1.hashable_state() == obj2.hashable_state()
-           if and only if obj1 and obj2 represent the same problem state.'''
+           if and only if obj1 and obj2 represent the same problem state.
+           The value is used as is as a key of the cycle check dictionary, so
+           it must be exact: returning hash(...) of a representation is not
+           enough, as two different states with colliding hashes would be
+           treated as the same state and wrongly pruned.'''
         raise Exception("Must be overridden in subclass.")
 
     def print_state(self):
         '''Print a representation of the state'''
         raise Exception("Must be overridden in subclass.")
 
+    def goal_states(self):
+        '''Only needed for bidirectional search. This method must return
+           the list of goal states of the problem self belongs to, each
+           with action "GOAL", gval 0 and parent None.'''
+        raise Exception("Must be overridden in subclass.")
+
+    def predecessors(self):
+        '''Only needed for bidirectional search. This method is the inverse
+           of successors: it must return the list of states from which
+           self can be reached by a single action, each with the data items
+           "action" the action that leads FROM the predecessor TO self,
+           "gval" the gval of self plus the cost of that action (i.e., the
+           cost of reaching a goal from the predecessor), and parent set
+           to self.'''
+        raise Exception("Must be overridden in subclass.")
+
+    def from_key(self, key, action, gval, parent):
+        '''Only needed to resume checkpointed searches. This method must
+           return a state of the same problem as self whose hashable_state()
+           is key, with the given action, gval and parent.'''
+        raise Exception("Must be overridden in subclass.")
+
     def print_path(self):
         '''print the sequence of actions used to reach self'''
         #can be over ridden to print problem specific information
@@ -112,14 +154,103 @@ _BEST_FIRST = 2
 _ASTAR = 3
 _UCS = 4
 _CUSTOM = 5
+#Linear memory strategies: they do not use OPEN nor the cycle check
+#dictionary, so their memory is proportional to the depth of the search.
+_IDASTAR = 6
+_RBFS = 7
+#Bidirectional strategies: they search forward from the initial state and
+#backward from the goal states (given by StateSpace.goal_states) until both
+#searches meet.
+_BIDIRECTIONAL_BFS = 8
+_BIDIRECTIONAL_ASTAR = 9
+#Iterative deepening: depth first searches with growing depth limits.
+_ITERATIVE_DEEPENING = 10
+#Hash distributed astar: each of several worker processes runs astar on the
+#states it owns, given by a hash of their keys.
+_HDASTAR = 11
+
+#For ucs, best first, astar and custom we use a priority queue. Nodes are
+#stored in the queue as (priority, tiebreak, node) entries, where the priority
+#is a tuple computed only once, when the node is inserted, and the tiebreak is
+#an insertion counter (so nodes themselves are never compared). These
+#functions compute the priority tuple of a node for each strategy.
+def _priority_g(node):
+    '''ucs: lowest gval first'''
+    return (node.gval,)
+
+def _priority_h(node):
+    '''best first: lowest hval first'''
+    return (node.hval,)
+
+def _priority_sum_hg(node):
+    '''astar: lowest fval = gval+hval first. Ties are broken in favour of
+       the GREATER gval, so nodes along deeper paths are expanded first,
+       causing the search to proceed directly to the goal'''
+    return (node.gval + node.hval, -node.gval)
+
+def _priority_custom(node):
+    '''custom: lowest value of the node's fval function first'''
+    return (node.fval_function(node),)
+
+def _priority_weighted(weight):
+    '''anytime search: returns the priority function ordering nodes by lowest
+       gval + weight*hval first, with ties broken as in astar'''
+    return lambda node: (node.gval + weight*node.hval, -node.gval)
+
+#The anytime search prunes nodes that can not improve on the incumbent
+#solution, i.e., with fval >= its cost. The cost bound prunes only fvals
+#over the bound, so it is set this much below the cost of the incumbent.
+_COST_EPSILON = 1e-9
+
+#Format of the files written by SearchEngine.checkpoint.
+_CHECKPOINT_VERSION = 1
+
+#hdastar: successors owned by another worker are sent to it in batches of up
+#to this many, and a worker reads its inbox at least every this many
+#expansions. An idle worker waits this many seconds for a batch before
+#checking again whether the search is over.
+_HDA_BATCH = 64
+_HDA_WAIT = 0.01
+#The parent process of hdastar checks every _HDA_POLL seconds that its workers
+#are alive while it waits for their results, and waits at most _HDA_GRACE
+#seconds for them after asking them to stop at the end of the time bound.
+_HDA_POLL = 0.1
+_HDA_GRACE = 5
+
+class _Expanded:
+    '''
+    Full cycle checking keeps the gval of each state reached in the cycle
+    check dictionary. With SearchEngine.skip_duplicates_on, once a node of
+    the state is expanded its gval is replaced by an equal _ExpandedInt or
+    _ExpandedFloat (see _expanded), so that nodes of the state with the
+    same gval extracted from OPEN or generated later are recognized as
+    duplicates and not expanded again.
+    The mark is kept with the dictionary, e.g., across the calls to
+    _searchOpen of search_anytime and in checkpoints.
+    '''
+    __slots__ = ()
+
+class _ExpandedInt(_Expanded, int):
+    __slots__ = ()
+
+class _ExpandedFloat(_Expanded, float):
+    __slots__ = ()
+
+#One mark per gval, so marking states does not allocate an object for each one.
+_EXPANDED = {}
 
-#For best first and astar we use a priority queue. This requires
-#a comparison function for nodes. These constants indicate if we use
-#the gval, the hval or the sum of gval and hval in the comparison.
-_SUM_HG = 0
-_H = 1
-_G = 2
-_C = 3
+def _expanded(gval):
+    '''The marked (see _Expanded) value equal to gval'''
+    mark = _EXPANDED.get(gval)
+    if mark is None:
+        mark = _EXPANDED[gval] = _ExpandedInt(gval) if isinstance(gval, int) else _ExpandedFloat(gval)
+    return mark
+
+def _number_array(values):
+    '''values as a compact array, of integers if all of them are integers'''
+    if all(isinstance(v, int) for v in values):
+        return array('q', values)
+    return array('d', values)
 
 #Cycle Checking. Either CC_NONE 'none' (no cycle checking), CC_PATH
 #'path' (path checking only) or CC_FULL 'full' (full cycle checking,
@@ -128,6 +259,21 @@ _CC_NONE = 0
 _CC_PATH = 1
 _CC_FULL = 2
 
+#Frontier used by the priority queue strategies (ucs, best_first, astar and
+#custom). FRONTIER_LAZY 'lazy' pushes a new node every time a cheaper path to a
+#state is found and discards the stale copies when they are extracted.
+#FRONTIER_INDEXED 'indexed' keeps an index from states to heap positions and
+#decreases the key of the node already on OPEN instead (full cycle checking only).
+#FRONTIER_BUCKET 'bucket' keeps a FIFO bucket per distinct priority, for ucs
+#and astar on unit cost problems with integer heuristics, and extracts nodes in
+#the same order as the lazy heap. Its operations on OPEN are cheaper when OPEN
+#holds many nodes per priority (with many distinct priorities it is a heap with
+#extra work), but on the sliders problems they are a small part of the search
+#time, so both frontiers take about the same time there.
+_FRONTIER_LAZY = 0
+_FRONTIER_INDEXED = 1
+_FRONTIER_BUCKET = 2
+
 #Zero Heuristic Function---for uninformed search don't include heur_fn
 #in call to search engine's search method, defaults heur_fn to the zero fn.
 def _zero_hfn(state):
@@ -146,7 +292,6 @@ class sNode:
     node object for convenience), and the number of the node'''
     
     n = 0
-    lt_type = _SUM_HG
     
     def __init__(self, state, hval, fval_function):
         self.state = state
@@ -154,36 +299,235 @@ class sNode:
         self.gval = state.gval
         self.index = sNode.n
         self.fval_function = fval_function
+        #cache of an incremental heuristic (see SearchEngine.init_search)
+        self.hcache = None
+        #number of actions from the initial state, set by the search
+        self.depth = 0
         sNode.n = sNode.n + 1
 
-    def __lt__(self, other):
-        '''For astar and best first we use a priority queue for the
-           OPEN set. This queue stores search nodes waiting to be
-           expanded. Thus we need to define a node1 < node2 function
-           by defining the __lt__ function. Dependent on the type of
-           search this comparison function compares the h-value, the
-           g-value or the f-value of the nodes. Note for the f-value
-           we wish to break ties by letting node1 < node2 if they both
-           have identical f-values but if node1 has a GREATER g
-           value. This means that we expand nodes along deeper paths
-           first causing the search to proceed directly to the goal'''
-                
-        if sNode.lt_type == _SUM_HG:
-            if (self.gval+self.hval) == (other.gval+other.hval):
-                #break ties by greatest gval. 
-                return self.gval > other.gval
-            else: return ((self.gval+self.hval) < (other.gval+other.hval))
-        if sNode.lt_type == _G:
-            return self.gval < other.gval
-        if sNode.lt_type == _H:
-            return self.hval < other.hval    
-        if sNode.lt_type == _C:  
-            return self.fval_function(self) <  other.fval_function(other)          
-        
-        print('sNode class has invalid comparator setting!')
-        
-        #return default of lowest gval (generating UCS behavior)
-        return self.gval < other.gval
+class _IndexedHeap:
+    '''Binary heap of (priority, tiebreak, node) entries with an index from
+       the hashable state of each node to its position in the heap. Inserting a node for a state
+       that is already on the heap keeps only the cheapest of the two nodes,
+       moving it up in place (decrease-key), so the heap never holds stale
+       duplicates. stale_avoided counts the duplicates the lazy scheme
+       would have pushed.'''
+
+    def __init__(self, priority):
+        self.priority = priority
+        self.counter = itertools.count()
+        self.heap = []
+        self.keys = []
+        self.position = dict()
+        self.stale_avoided = 0
+
+    def insert(self, node):
+        key = node.state.hashable_state()
+        i = self.position.get(key)
+        if i is None:
+            self.heap.append((self.priority(node), next(self.counter), node))
+            self.keys.append(key)
+            self._sift_up(len(self.heap) - 1)
+            return
+        self.stale_avoided = self.stale_avoided + 1
+        if node.gval < self.heap[i][2].gval:
+            self.heap[i] = (self.priority(node), next(self.counter), node)
+            self._sift_up(i)
+            self._sift_down(self.position[key])
+
+    def reprioritize(self, priority):
+        '''Recompute the priority of every entry with priority and restore
+           the heap order in place'''
+        self.priority = priority
+        self.heap[:] = [(priority(node), tiebreak, node) for _, tiebreak, node in self.heap]
+        for i in reversed(range(len(self.heap) // 2)):
+            self._sift_down(i)
+
+    def extract(self):
+        heap = self.heap
+        keys = self.keys
+        node = heap[0][2]
+        del self.position[keys[0]]
+        last = heap.pop()
+        last_key = keys.pop()
+        if heap:
+            heap[0] = last
+            keys[0] = last_key
+            self.position[last_key] = 0
+            self._sift_down(0)
+        return node
+
+    def _sift_up(self, i):
+        heap = self.heap
+        keys = self.keys
+        position = self.position
+        entry = heap[i]
+        key = keys[i]
+        while i > 0:
+            parent = (i - 1) >> 1
+            if not entry < heap[parent]:
+                break
+            heap[i] = heap[parent]
+            keys[i] = keys[parent]
+            position[keys[i]] = i
+            i = parent
+        heap[i] = entry
+        keys[i] = key
+        position[key] = i
+
+    def _sift_down(self, i):
+        heap = self.heap
+        keys = self.keys
+        position = self.position
+        size = len(heap)
+        entry = heap[i]
+        key = keys[i]
+        while True:
+            child = 2*i + 1
+            if child >= size:
+                break
+            if child + 1 < size and heap[child + 1] < heap[child]:
+                child = child + 1
+            if not heap[child] < entry:
+                break
+            heap[i] = heap[child]
+            keys[i] = keys[child]
+            position[keys[i]] = i
+            i = child
+        heap[i] = entry
+        keys[i] = key
+        position[key] = i
+
+class _BucketQueue:
+    '''Priority queue for searches with few distinct priorities, such as
+       ucs and astar on unit cost problems with integer heuristics. Nodes
+       are kept in buckets[p], a FIFO deque for each priority tuple p on
+       the queue, and the distinct priorities in the heap keys. Inserting
+       into an existing bucket is a dictionary lookup and an append, and
+       only the first node of a new priority (and the extraction of the
+       last node of one) touches the heap, which stays small. Nodes of
+       equal priority come out in insertion order, as from the lazy heap,
+       so both frontiers expand the same nodes.'''
+
+    def __init__(self, priority):
+        self.priority = priority
+        self.buckets = {}
+        self.keys = []
+        self.size = 0
+
+    def __len__(self): return self.size
+
+    def insert(self, node):
+        p = self.priority(node)
+        bucket = self.buckets.get(p)
+        if bucket is None:
+            bucket = self.buckets[p] = deque()
+            heapq.heappush(self.keys, p)
+        bucket.append(node)
+        self.size = self.size + 1
+
+    def extract(self):
+        p = self.keys[0]
+        bucket = self.buckets[p]
+        node = bucket.popleft()
+        if not bucket:
+            del self.buckets[p]
+            heapq.heappop(self.keys)
+        self.size = self.size - 1
+        return node
+
+    def nodes(self):
+        return [node for bucket in self.buckets.values() for node in bucket]
+
+    def min_priority(self):
+        return self.keys[0]
+
+class NodeStore:
+    '''The states reached by a search in node store mode (see
+       SearchEngine.node_store_on), kept in array columns instead of one
+       object per state: the key (the hashable_state of the state, which
+       must be a bytes object of the same length for every state), the gval,
+       the index of the parent (-1 for the initial state) and the code of
+       the action (an index into the table of action labels). States are
+       rebuilt from the columns, with StateSpace.from_key, only when they
+       are needed: to expand them, and to return the path to the goal.'''
+
+    def __init__(self, prototype):
+        self.prototype = prototype
+        self.key_size = None
+        self.keys = bytearray()
+        self.gvals = array('q')
+        self.parents = array('q')
+        self.actions = array('I')
+        self.action_labels = []
+        self.action_codes = dict()
+
+    def __len__(self): return len(self.parents)
+
+    def append(self, key, gval, parent, action):
+        '''Add a state, returning its index'''
+        if self.key_size is None:
+            if not isinstance(key, bytes):
+                raise ValueError("The node store needs bytes keys, not {}".format(type(key).__name__))
+            self.key_size = len(key)
+        if len(key) != self.key_size:
+            raise ValueError("The node store needs keys of the same length")
+        code = self.action_codes.get(action)
+        if code is None:
+            code = len(self.action_labels)
+            self.action_codes[action] = code
+            self.action_labels.append(action)
+        if self.gvals.typecode == 'q' and not isinstance(gval, int):
+            self.gvals = array('d', self.gvals)
+        self.keys += key
+        self.gvals.append(gval)
+        self.parents.append(parent)
+        self.actions.append(code)
+        return len(self.parents) - 1
+
+    def key(self, i):
+        return bytes(self.keys[i*self.key_size:(i + 1)*self.key_size])
+
+    def state(self, i, parent=None):
+        '''The state with index i, with the given parent'''
+        return self.prototype.from_key(self.key(i), self.action_labels[self.actions[i]], self.gvals[i], parent)
+
+    def path(self, i):
+        '''The state with index i, with the parent chain of all the states on its path'''
+        indices = []
+        while i >= 0:
+            indices.append(i)
+            i = self.parents[i]
+        state = None
+        for j in reversed(indices):
+            state = self.state(j, state)
+        return state
+
+    def on_path(self, i, key):
+        '''True if key is the key of the state with index i or of one of its ancestors'''
+        while i >= 0:
+            if self.key(i) == key:
+                return True
+            i = self.parents[i]
+        return False
+
+    def nbytes(self):
+        '''Memory used by the columns, in bytes'''
+        return (len(self.keys) + self.gvals.itemsize*len(self.gvals) +
+                self.parents.itemsize*len(self.parents) + self.actions.itemsize*len(self.actions))
+
+class _StoredNode:
+    '''Search node in node store mode: the index of its state in the
+       NodeStore takes the place of the state'''
+    __slots__ = ('index', 'gval', 'hval', 'fval_function', 'hcache', 'depth')
+
+    def __init__(self, index, gval, hval, fval_function):
+        self.index = index
+        self.gval = gval
+        self.hval = hval
+        self.fval_function = fval_function
+        self.hcache = None
+        self.depth = 0
 
 class Open:
     '''Open objects hold the search frontier---the set of unexpanded
@@ -192,7 +536,13 @@ class Open:
        functions to operate as needed by the particular search
        strategy'''
     
-    def __init__(self, search_strategy):
+    def __init__(self, search_strategy, frontier=_FRONTIER_LAZY):
+        self.indexed = None
+        self.buckets = None
+        self.priority = None
+        if frontier == _FRONTIER_BUCKET and search_strategy not in [_UCS, _ASTAR]:
+            #buckets are only used by ucs and astar (see FRONTIER_BUCKET)
+            frontier = _FRONTIER_LAZY
         if search_strategy == _DEPTH_FIRST:
             #use stack for OPEN set (last in---most recent successor added---is first out)
             self.open = []
@@ -205,74 +555,307 @@ class Open:
             self.extract = self.open.popleft
         elif search_strategy == _UCS:
             #use priority queue for OPEN (first out is node with lowest gval)
-            self.open = []
-            #set node less than function to compare gvals only
-            sNode.lt_type = _G
-            self.insert = lambda node: heapq.heappush(self.open, node)
-            self.extract = lambda: heapq.heappop(self.open)            
+            self._use_heap(_priority_g, frontier)
         elif search_strategy == _BEST_FIRST:
             #use priority queue for OPEN (first out is node with lowest hval)
-            self.open = []
-            #set node less than function to compare hvals only
-            sNode.lt_type = _H
-            self.insert = lambda node: heapq.heappush(self.open, node)
-            self.extract = lambda: heapq.heappop(self.open)
+            self._use_heap(_priority_h, frontier)
         elif search_strategy == _ASTAR:
             #use priority queue for OPEN (first out is node with lowest fval = gval+hval)
-            self.open = []
-            #set node less than function to compare sums of hval and gval
-            sNode.lt_type = _SUM_HG
-            self.insert = lambda node: heapq.heappush(self.open, node)
-            self.extract = lambda: heapq.heappop(self.open) 
+            self._use_heap(_priority_sum_hg, frontier)
         elif search_strategy == _CUSTOM:
             #use priority queue for OPEN (first out is node with lowest fval)
+            self._use_heap(_priority_custom, frontier)
+
+    def _use_heap(self, priority, frontier):
+        self.priority = priority
+        self.buckets = None
+        if frontier == _FRONTIER_BUCKET:
+            self.buckets = _BucketQueue(priority)
+            self.open = self.buckets
+            self.insert = self.buckets.insert
+            self.extract = self.buckets.extract
+        elif frontier == _FRONTIER_INDEXED:
+            self.indexed = _IndexedHeap(priority)
+            self.open = self.indexed.heap
+            self.insert = self.indexed.insert
+            self.extract = self.indexed.extract
+        else:
             self.open = []
-            #set node less than function to compare sums of fval    
-            sNode.lt_type = _C
-            self.insert = lambda node: heapq.heappush(self.open, node)
-            self.extract = lambda: heapq.heappop(self.open)          
+            counter = itertools.count()
+            self.insert = lambda node: heapq.heappush(self.open, (self.priority(node), next(counter), node))
+            self.extract = lambda: heapq.heappop(self.open)[2]
+
+    def reprioritize(self, priority):
+        '''Change the priority function of a priority queue OPEN, recomputing
+           the priority of the nodes already on it. The heaps are reordered
+           in place, keeping the insertion tiebreaks.'''
+        if self.buckets:
+            nodes = self.buckets.nodes()
+            self._use_heap(priority, _FRONTIER_BUCKET)
+            for nd in nodes:
+                self.insert(nd)
+        elif self.indexed:
+            self.priority = priority
+            self.indexed.reprioritize(priority)
+        else:
+            self.priority = priority
+            self.open[:] = [(priority(node), tiebreak, node) for _, tiebreak, node in self.open]
+            heapq.heapify(self.open)
 
     def empty(self): return not self.open
 
+    def nodes_in_order(self):
+        '''The nodes on OPEN, in an order that rebuilds the same OPEN when
+           they are inserted again into an empty one'''
+        if self.priority and not self.buckets:
+            return [entry[2] for entry in sorted(self.open)]
+        return self.nodes()
+
+    def min_priority(self):
+        '''Priority of the next node to be extracted (priority queues only)'''
+        if self.buckets:
+            return self.buckets.min_priority()
+        return self.open[0][0]
+
+    def stale_avoided(self):
+        '''Number of stale duplicates not pushed thanks to the indexed frontier'''
+        return self.indexed.stale_avoided if self.indexed else 0
+
+    def nodes(self):
+        '''The nodes on OPEN, in no particular order'''
+        if self.buckets:
+            return self.buckets.nodes()
+        if self.priority:
+            return [entry[2] for entry in self.open]
+        return list(self.open)
+
     def print_open(self):
         print("{", end="")
-        if len(self.open) == 1: 
-            print("   <S{}:{}:{}, g={}, h={}, f=g+h={}>".format(self.open[0].state.index, self.open[0].state.action, self.open[0].state.hashable_state(), self.open[0].gval, self.open[0].hval, self.open[0].gval+self.open[0].hval), end="")
+        for nd in self.nodes():
+            print("   <S{}:{}:{}, g={}, h={}, f=g+h={}>".format(nd.state.index, nd.state.action, nd.state.hashable_state(), nd.gval, nd.hval, nd.gval+nd.hval), end="")
+        print("}")
+
+class SearchStats:
+    '''Statistics of the search started by the last call to init_search,
+       kept in SearchEngine.stats (and accumulated if search is called again
+       to resume it). The time_* fields are only measured while profiling is
+       on (see SearchEngine.profile_on), otherwise they stay at 0.'''
+    def __init__(self):
+        self.expanded = 0               #nodes whose successors were generated
+        self.generated = 0              #successor states generated by those expansions
+        self.cycle_check_pruned = 0
+        self.cost_bound_pruned = 0
+        self.successors_pruned = 0      #successors not generated by the state class (see StateSpace.successors_pruned)
+        self.depth_limit_pruned = 0     #nodes not expanded because of the depth limit
+        self.stale_pops = 0             #nodes extracted from OPEN after a cheaper path to their state was found
+        self.duplicate_pops = 0         #nodes extracted from OPEN whose state was already expanded with the same gval
+                                        #(only counted with skip_duplicates_on; not expanded again, unless there
+                                        #is a depth limit)
+        self.stale_avoided = 0
+        self.peak_open = 0              #largest size of OPEN, measured after each expansion
+        self.peak_cc_dictionary = 0
+        self.time_successors = 0.0
+        self.time_heuristic = 0.0
+        self.time_hashing = 0.0
+        self.time_queue = 0.0
+        self.search_time = 0.0          #CPU time, as measured for the time bound
+        self.solution_cost = None
+
+    def as_dict(self):
+        return dict(vars(self))
+
+    def __str__(self):
+        return ", ".join("{} = {}".format(field, value) for field, value in vars(self).items())
+
+def _timed(fn, stats, field):
+    '''Returns fn, adding the time spent in each call to field of stats'''
+    def timed(*args):
+        start = time.perf_counter()
+        result = fn(*args)
+        setattr(stats, field, getattr(stats, field) + time.perf_counter() - start)
+        return result
+    return timed
+
+class SearchTracer:
+    '''Observer that prints the progress of an OPEN based search, for
+       debugging (see SearchEngine.trace_on). Level 1 prints each node
+       extracted from OPEN and the successors of each expansion, level 2
+       also what is done with each successor. The heuristic values printed
+       are the ones computed by the search: successors pruned by cycle
+       checking are never evaluated, and are printed with h=None.
+       Subclasses can override any of these methods to observe a search.'''
+    def __init__(self, level=1):
+        self.level = level
+
+    def start(self, engine):
+        '''Called before the first node is extracted from OPEN'''
+        if self.level < 1:
+            return
+        print("   TRACE: Initial OPEN: ", engine.open.print_open())
+        if engine.cycle_check == _CC_FULL:
+            print("   TRACE: Initial CC_Dict:", engine.cc_dictionary)
+
+    def extract(self, engine, node):
+        '''Called with each node extracted from OPEN'''
+        if self.level < 1:
+            return
+        print("   TRACE: Next State to expand: <S{}:{}:{}, g={}, h={}, f=g+h={}>".format(
+            node.state.index, node.state.action, node.state.hashable_state(), node.gval, node.hval, node.gval + node.hval))
+        if node.state.gval != node.gval:
+            print("ERROR: Node gval not equal to state gval!")
+        if engine.cycle_check == _CC_FULL and node.state.hashable_state() in engine.cc_dictionary:
+            print("   TRACE: CC_dict gval={}, node.gval={}".format(
+                engine.cc_dictionary[node.state.hashable_state()], node.gval))
+
+    def successor(self, engine, succ, hval, outcome):
+        '''Called with each successor state of the node being expanded, its
+           heuristic value (None if it was not computed) and what was done
+           with it: 'cycle' (pruned by cycle checking), 'costbound' (pruned
+           by the cost bound) or 'open' (added to OPEN)'''
+        if self.level < 2:
+            return
+        print("   TRACE: Successor State:", end="")
+        succ.print_state()
+        print("   TRACE: Heuristic Value:", hval)
+        hash_state = succ.hashable_state()
+        if engine.cycle_check == _CC_FULL and hash_state in engine.cc_dictionary:
+            print("   TRACE: Already in CC_dict, CC_dict gval={}, successor state gval={}".format(
+                engine.cc_dictionary[hash_state], succ.gval))
+        if outcome == 'cycle':
+            if engine.cycle_check == _CC_PATH:
+                print("   TRACE: On cyclic path")
+            print(" TRACE: Successor State pruned by cycle checking")
+        elif outcome == 'costbound':
+            print(" TRACE: Successor State pruned, over current cost bound")
         else:
-            for nd in self.open:
-                print("   <S{}:{}:{}, g={}, h={}, f=g+h={}>".format(nd.state.index, nd.state.action, nd.state.hashable_state(), nd.gval, nd.hval, nd.gval+nd.hval), end="")
+            print(" TRACE: Successor State added to OPEN")
+        print("\n")
+
+    def expanded(self, engine, node, successors):
+        '''Called after expanding node, with the list of (successor state,
+           heuristic value) pairs it generated'''
+        if self.level < 1:
+            return
+        print("   TRACE: Expanded Node. Successors = {", end="")
+        for ss, hval in successors:
+            print("<S{}:{}:{}, g={}, h={}, f=g+h={}>, ".format(
+                ss.index, ss.action, ss.hashable_state(), ss.gval, hval, None if hval is None else ss.gval + hval), end="")
         print("}")
 
 class SearchEngine:
-    def __init__(self, strategy = 'depth_first', cc_level = 'default'):
-        self.set_strategy(strategy, cc_level)
+    def __init__(self, strategy = 'depth_first', cc_level = 'default', frontier = 'lazy'):
+        self.set_strategy(strategy, cc_level, frontier)
         self.trace = 0
+        self.tracer = None
+        self.node_store = False
+        self.store = None
+        self.skip_duplicates = False
+        self.profile = False
+        self.on_expand = None
+        self.on_generate = None
+        self.workers = None
 
     def initStats(self):
         sNode.n = 0
         StateSpace.n = 1    #initial state already generated on call so search
+        StateSpace.successors_pruned = 0
         self.cycle_check_pruned = 0
         self.cost_bound_pruned = 0
+        self.stale_avoided = 0
+        self.stats = SearchStats()
 
-    def trace_on(self, level = 1):
-        '''For debugging, set tracking level 1 or 2'''
+    def trace_on(self, level = 1, tracer = None):
+        '''For debugging, set tracking level 1 or 2. OPEN based searches
+           report to tracer, a SearchTracer of that level by default. Level
+           0 (or less) without a tracer turns tracing off, see trace_off'''
         self.trace = level
+        if tracer is None and level <= 0:
+            self.tracer = None
+        else:
+            self.tracer = tracer if tracer is not None else SearchTracer(level)
 
     def trace_off(self):
         '''Turn off tracing'''
         self.trace = 0
+        self.tracer = None
+
+    def node_store_on(self):
+        '''Keep the states reached by the OPEN based strategies in a
+           NodeStore instead of as objects, cutting the memory used per
+           state. The states must have bytes keys of the same length and
+           implement from_key. Tracing, profiling, hooks, checkpoints and
+           the indexed frontier are not available in this mode.'''
+        self.node_store = True
+
+    def node_store_off(self):
+        '''Keep the states reached as objects again'''
+        self.node_store = False
+
+    def skip_duplicates_on(self):
+        '''With full cycle checking, do not expand a state again when it is
+           reached again with the gval it was already expanded with (see
+           _Expanded): those nodes are skipped when extracted from OPEN and
+           pruned when generated. Only safe when the order of OPEN does not
+           depend on the path to a state beyond its gval, or when the first
+           of the paths extracted is as good as the others'''
+        self.skip_duplicates = True
+
+    def skip_duplicates_off(self):
+        '''Expand states reached again with the same gval, as by default'''
+        self.skip_duplicates = False
+
+    def profile_on(self):
+        '''Measure the time spent generating successors, evaluating the
+           heuristic, hashing states and operating on OPEN (OPEN based
+           strategies only), see SearchStats'''
+        self.profile = True
+
+    def profile_off(self):
+        '''Turn off profiling'''
+        self.profile = False
+
+    def set_hooks(self, on_expand=None, on_generate=None):
+        '''
+        Set functions to be called during the search (OPEN based strategies,
+        idastar and rbfs), or None to remove them.
+        @param on_expand: called as on_expand(node) with each node about to be expanded.
+        @param on_generate: called as on_generate(node, succ_node) with each
+                            new node succ_node created while expanding node.
+        '''
+        self.on_expand = on_expand
+        self.on_generate = on_generate
+
+    def set_workers(self, workers=None):
+        '''Set the number of worker processes of hdastar (by default, one per core).'''
+        self.workers = workers
 
-    def set_strategy(self, s, cc = 'default'):
-        if not s in ['depth_first', 'breadth_first', 'ucs', 'best_first', 'astar', 'custom']:
+    def set_strategy(self, s, cc = 'default', frontier = 'lazy'):
+        if not s in ['depth_first', 'breadth_first', 'ucs', 'best_first', 'astar', 'custom', 'idastar', 'rbfs',
+                     'bidirectional_bfs', 'bidirectional_astar', 'iterative_deepening', 'hdastar']:
             print('Unknown search strategy specified:', s)
-            print("Must be one of 'depth_first', 'ucs', 'breadth_first', 'best_first', 'custom' or 'astar'")
+            print("Must be one of 'depth_first', 'ucs', 'breadth_first', 'best_first', 'custom', 'astar', 'idastar', 'rbfs',")
+            print("'bidirectional_bfs', 'bidirectional_astar', 'iterative_deepening' or 'hdastar'")
         elif not cc in ['default', 'none', 'path', 'full']:
             print('Unknown cycle check level', cc)
             print( "Must be one of ['default', 'none', 'path', 'full']")
+        elif not frontier in ['lazy', 'indexed', 'bucket']:
+            print('Unknown frontier', frontier)
+            print( "Must be one of ['lazy', 'indexed', 'bucket']")
 
         else:
+            if s in ['idastar', 'rbfs', 'iterative_deepening'] and cc == 'full':
+                print('Full cycle checking would defeat the linear memory of', s)
+                print('Using path checking instead')
+                cc = 'path'
+            if s in ['bidirectional_bfs', 'bidirectional_astar'] and cc not in ['default', 'full']:
+                print('Bidirectional search needs full cycle checking to detect when both searches meet')
+                cc = 'full'
+            if s == 'hdastar' and cc not in ['default', 'full']:
+                print('hdastar always detects duplicates, with the states each worker owns')
+                cc = 'full'
+
             if cc == 'default' :
-                if s == 'depth_first' :
+                if s in ['depth_first', 'idastar', 'rbfs', 'iterative_deepening'] :
                     self.cycle_check = _CC_PATH
                 else:
                     self.cycle_check = _CC_FULL
@@ -286,6 +869,16 @@ class SearchEngine:
             elif s == 'best_first'   : self.strategy = _BEST_FIRST
             elif s == 'astar'        : self.strategy = _ASTAR       
             elif s == 'custom' : self.strategy = _CUSTOM             
+            elif s == 'idastar'      : self.strategy = _IDASTAR
+            elif s == 'rbfs'         : self.strategy = _RBFS
+            elif s == 'bidirectional_bfs'   : self.strategy = _BIDIRECTIONAL_BFS
+            elif s == 'bidirectional_astar' : self.strategy = _BIDIRECTIONAL_ASTAR
+            elif s == 'iterative_deepening' : self.strategy = _ITERATIVE_DEEPENING
+            elif s == 'hdastar'      : self.strategy = _HDASTAR
+
+            if   frontier == 'lazy'    : self.frontier = _FRONTIER_LAZY
+            elif frontier == 'indexed' : self.frontier = _FRONTIER_INDEXED
+            elif frontier == 'bucket'  : self.frontier = _FRONTIER_BUCKET
 
     def get_strategy(self):
         if   self.strategy == _DEPTH_FIRST    : rval = 'depth_first'
@@ -294,6 +887,12 @@ class SearchEngine:
         elif self.strategy == _UCS          : rval = 'ucs' 
         elif self.strategy == _ASTAR          : rval = 'astar'      
         elif self.strategy == _CUSTOM          : rval = 'custom'   
+        elif self.strategy == _IDASTAR         : rval = 'idastar'
+        elif self.strategy == _RBFS            : rval = 'rbfs'
+        elif self.strategy == _BIDIRECTIONAL_BFS   : rval = 'bidirectional_bfs'
+        elif self.strategy == _BIDIRECTIONAL_ASTAR : rval = 'bidirectional_astar'
+        elif self.strategy == _ITERATIVE_DEEPENING : rval = 'iterative_deepening'
+        elif self.strategy == _HDASTAR         : rval = 'hdastar'
   
         rval = rval + ' with '
 
@@ -301,16 +900,30 @@ class SearchEngine:
         elif self.cycle_check == _CC_PATH : rval = rval + 'path checking'
         elif self.cycle_check == _CC_FULL : rval = rval + 'full cycle checking'
 
+        if self.strategy in [_UCS, _BEST_FIRST, _ASTAR, _CUSTOM]:
+            if self.frontier == _FRONTIER_INDEXED and self.cycle_check == _CC_FULL:
+                rval = rval + ' and indexed frontier'
+            elif self.frontier == _FRONTIER_BUCKET and self.strategy in [_UCS, _ASTAR]:
+                rval = rval + ' and bucket frontier'
+
         return rval
 
-    def init_search(self, initState, goal_fn, heur_fn=_zero_hfn, fval_function=_fval_function):
+    def init_search(self, initState, goal_fn, heur_fn=_zero_hfn, fval_function=_fval_function, backward_heur_fn=_zero_hfn):
         """
         Get ready to search. Call search on this object to run the search.
 
         @param initState: the state of the puzzle to start the search from.
         @param goal_fn: the goal function for the puzzle
-        @param heur_fn: the heuristic function to use (only relevant for search strategies that use heuristics)
+        @param heur_fn: the heuristic function to use (only relevant for search strategies that use heuristics).
+                        It may also have a batch attribute: a function that takes the list of successors
+                        of an expansion and returns the list of their heuristic values in one call
+                        (used by the OPEN based strategies and rbfs instead of calling heur_fn on each one).
+                        Or it may have an incremental attribute: a function incremental(state, action, cache)
+                        returning (hval, cache) for state, where cache is the one returned for the parent
+                        of state and action the action that generated state (both None for the initial
+                        state). It is preferred over batch and heur_fn by the OPEN based strategies, idastar and rbfs.
         @param fval_fn: the f-value function (only relevant for custom search strategy)
+        @param backward_heur_fn: estimate of the distance from a state to initState (only relevant for bidirectional astar)
         """
         #Perform full cycle checking as follows
         #a. check state before inserting into OPEN. If we had already reached
@@ -330,9 +943,26 @@ class SearchEngine:
             print("   TRACE: Initial State:", end="")
             initState.print_state()
         #END 
-        self.open = Open(self.strategy)
-
-        node = sNode(initState, heur_fn(initState), fval_function)      
+        if self.strategy in [_IDASTAR, _RBFS, _BIDIRECTIONAL_BFS, _BIDIRECTIONAL_ASTAR, _ITERATIVE_DEEPENING, _HDASTAR]:
+            #linear memory, bidirectional and parallel strategies search from
+            #the root node with their own data structures, there is no OPEN
+            self.open = None
+        elif self.node_store and self.frontier == _FRONTIER_INDEXED:
+            print('The indexed frontier is not available in node store mode, using the lazy frontier')
+            self.open = Open(self.strategy)
+        elif self.cycle_check == _CC_FULL or self.frontier != _FRONTIER_INDEXED:
+            self.open = Open(self.strategy, self.frontier)
+        else:
+            #without full cycle checking nodes for the same state must not be merged
+            self.open = Open(self.strategy)
+
+        incremental_heur_fn = getattr(heur_fn, 'incremental', None)
+        if incremental_heur_fn:
+            hval, hcache = incremental_heur_fn(initState, None, None)
+            node = sNode(initState, hval, fval_function)
+            node.hcache = hcache
+        else:
+            node = sNode(initState, heur_fn(initState), fval_function)      
 
         #the cycle check dictionary stores the cheapest path (g-val) found
         #so far to a state. 
@@ -340,43 +970,271 @@ class SearchEngine:
             self.cc_dictionary = dict() 
             self.cc_dictionary[initState.hashable_state()] = initState.gval
         
-        self.open.insert(node)
+        self.root = node
+        self.store = None
+        if self.open is not None and self.node_store:
+            self.store = NodeStore(initState)
+            stored = _StoredNode(self.store.append(initState.hashable_state(), initState.gval, -1, initState.action),
+                                 node.gval, node.hval, fval_function)
+            stored.hcache = node.hcache
+            self.open.insert(stored)
+        elif self.open is not None:
+            self.open.insert(node)
         self.fval_function = fval_function
         self.goal_fn = goal_fn
         self.heur_fn = heur_fn
+        self.backward_heur_fn = backward_heur_fn
 
-    def search(self, timebound=None, costbound=None):
+    def search(self, timebound=None, costbound=None, depth_limit=None):
         """
         Start searching, using the parameters set by init_search.
 
         @param timebound: the maximum amount of time, in seconds, to spend on this search.
         @param costbound: the cost bound 3-tuple for pruning, as specified in the assignment.
+        @param depth_limit: for the OPEN based strategies (e.g., depth limited depth_first), nodes
+                            at this depth are not expanded. For iterative_deepening, the largest
+                            depth limit to try (no limit if None).
         """
 
         goal_node = []
 
         ###NOW do the search and return the result
-        self.search_start_time = os.times()[0]
-        self.search_stop_time = None
-        if timebound:
-            self.search_stop_time = self.search_start_time + timebound
-        goal_node = self._searchOpen(self.goal_fn, self.heur_fn, self.fval_function, costbound)
+        self._start_timer(timebound)
+        if self.strategy == _IDASTAR:
+            goal_node = self._searchIDA(self.goal_fn, self.heur_fn, costbound)
+        elif self.strategy == _RBFS:
+            goal_node = self._searchRBFS(self.goal_fn, self.heur_fn, costbound)
+        elif self.strategy == _BIDIRECTIONAL_BFS:
+            goal_node = self._searchBidirectionalBFS(self.goal_fn, costbound)
+        elif self.strategy == _BIDIRECTIONAL_ASTAR:
+            goal_node = self._searchBidirectionalAstar(self.goal_fn, self.heur_fn, self.backward_heur_fn, costbound)
+        elif self.strategy == _ITERATIVE_DEEPENING:
+            goal_node = self._searchIterativeDeepening(self.goal_fn, self.heur_fn, costbound, depth_limit)
+        elif self.strategy == _HDASTAR:
+            goal_node = self._searchHDA(self.goal_fn, self.heur_fn, costbound, timebound)
+        else:
+            goal_node = self._searchOpen(self.goal_fn, self.heur_fn, self.fval_function, costbound, depth_limit)
+
+        total_search_time = os.times()[0] - self.search_start_time
+        self._update_stats(total_search_time)
 
         if goal_node:
-            total_search_time = os.times()[0] - self.search_start_time
+            self.stats.solution_cost = goal_node.gval
             #print("Solution Found with cost of {} in search time of {} sec".format(goal_node.gval, total_search_time))
-            #print("Nodes expanded = {}, states generated = {}, states cycle check pruned = {}, states cost bound pruned = {}".format(
-            #    sNode.n, StateSpace.n, self.cycle_check_pruned, self.cost_bound_pruned))
+            #print(self.stats)
             return goal_node.state
         else:
             #exited the while without finding goal---search failed
-            total_search_time = os.times()[0] - self.search_start_time            
             #print("Search Failed! No solution found.")
-            #print("Nodes expanded = {}, states generated = {}, states cycle check pruned = {}, states cost bound pruned = {}".format(
-            #    sNode.n, StateSpace.n, self.cycle_check_pruned, self.cost_bound_pruned))
+            #print(self.stats)
             return False
 
-    def _searchOpen(self, goal_fn, heur_fn, fval_function, costbound):
+    def search_anytime(self, timebound=None, weights=(1.,), costbound=None):
+        """
+        Anytime weighted astar, continuing the search set up by init_search
+        (with one of the priority queue strategies). Nodes are extracted
+        from OPEN by lowest gval + weight*hval. Each time a goal cheaper
+        than the incumbent (the best solution found so far) is extracted it
+        becomes the new incumbent, and the search goes on from the same OPEN
+        and cycle check dictionary, pruning (through the cost bound) every
+        node with fval = gval+hval no lower than the cost of the incumbent.
+
+        This is a generator of the improving solutions found, as tuples
+        (goal state, cost, seconds since the search started). It stops when
+        OPEN is empty, which proves the last incumbent optimal if the
+        heuristic is admissible, or when the time bound is exceeded.
+
+        @param timebound: the maximum amount of time, in seconds, to spend on this search.
+        @param weights: the weights to use, in order. The search moves on to
+                        the next weight after each new incumbent (re-prioritizing
+                        OPEN in place), and keeps the last one until it stops.
+        @param costbound: the cost bound 3-tuple for pruning, as specified in the assignment.
+        """
+        if self.open is None or not self.open.priority:
+            print('Anytime search needs a priority queue strategy, not', self.get_strategy())
+            return
+        self._start_timer(timebound)
+        bound = list(costbound) if costbound is not None else [float('inf')]*3
+        weights = list(weights)
+        self.open.reprioritize(_priority_weighted(weights[0]))
+        incumbent = float('inf')
+        while True:
+            start = os.times()[0]
+            goal_node = self._searchOpen(self.goal_fn, self.heur_fn, self.fval_function, bound)
+            self._update_stats(os.times()[0] - start)
+            if not goal_node:
+                return
+            if goal_node.gval < incumbent:
+                incumbent = goal_node.gval
+                self.stats.solution_cost = incumbent
+                bound[2] = min(bound[2], incumbent - _COST_EPSILON)
+                yield goal_node.state, incumbent, os.times()[0] - self.search_start_time
+                if len(weights) > 1:
+                    weights.pop(0)
+                    self.open.reprioritize(_priority_weighted(weights[0]))
+
+    def checkpoint(self, path):
+        """
+        Save the search set up by init_search (and maybe run for a while by
+        search, e.g., until its time bound was exceeded) to the file path, so
+        that it can be continued later with resume, maybe on another machine.
+        Only the OPEN based strategies can be checkpointed.
+
+        Nodes and states are not pickled: each state on the paths to the
+        nodes on OPEN is saved as the index of its hashable_state in a table
+        of keys (shared with the cycle check dictionary), the index of its
+        action in a table of actions, its gval and the index of its parent,
+        in compact arrays. So the keys must be picklable, and the state class
+        must be able to rebuild states from them (see StateSpace.from_key).
+
+        @param path: the file to write (gzip compressed).
+        """
+        if self.open is None:
+            print('Only OPEN based searches can be checkpointed, not', self.get_strategy())
+            return False
+        if self.store is not None:
+            print('Searches in node store mode can not be checkpointed')
+            return False
+        keys = []
+        key_index = dict()
+        if self.cycle_check == _CC_FULL:
+            for key in self.cc_dictionary:
+                key_index[key] = len(keys)
+                keys.append(key)
+        actions = []
+        action_index = dict()
+        #the states, parents before children
+        states = []
+        state_index = dict()
+        def index_of(state):
+            chain = []
+            while state is not None and id(state) not in state_index:
+                chain.append(state)
+                state = state.parent
+            for st in reversed(chain):
+                state_index[id(st)] = len(states)
+                states.append(st)
+            return state_index[id(chain[0])] if chain else state_index[id(state)]
+
+        nodes = self.open.nodes_in_order()
+        open_states = array('q', [index_of(node.state) for node in nodes])
+        root = index_of(self.root.state)
+        state_key = array('q')
+        state_action = array('q')
+        state_parent = array('q')
+        for st in states:
+            key = st.hashable_state()
+            if key not in key_index:
+                key_index[key] = len(keys)
+                keys.append(key)
+            if st.action not in action_index:
+                action_index[st.action] = len(actions)
+                actions.append(st.action)
+            state_key.append(key_index[key])
+            state_action.append(action_index[st.action])
+            state_parent.append(state_index[id(st.parent)] if st.parent is not None else -1)
+
+        data = {
+            'version': _CHECKPOINT_VERSION,
+            'strategy': self.strategy,
+            'cycle_check': self.cycle_check,
+            'frontier': self.frontier,
+            'keys': keys,
+            'actions': actions,
+            'state_key': state_key,
+            'state_action': state_action,
+            'state_gval': _number_array([st.gval for st in states]),
+            'state_parent': state_parent,
+            'root': root,
+            'open_state': open_states,
+            'open_hval': _number_array([node.hval for node in nodes]),
+            'cc_gval': _number_array(list(self.cc_dictionary.values())) if self.cycle_check == _CC_FULL else None,
+            'cc_expanded': bytes(isinstance(gval, _Expanded) for gval in self.cc_dictionary.values())
+                           if self.cycle_check == _CC_FULL else None,
+            'counters': (sNode.n, StateSpace.n, self.cycle_check_pruned, self.cost_bound_pruned),
+            'stats': self.stats.as_dict(),
+        }
+        with gzip.open(path, 'wb') as f:
+            pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+        return True
+
+    def resume(self, path, initState, goal_fn, heur_fn=_zero_hfn, fval_function=_fval_function, backward_heur_fn=_zero_hfn):
+        """
+        Get ready to continue the search saved to path by checkpoint. Call
+        search on this object to run it. The parameters are those of
+        init_search; the search strategy, cycle checking and frontier are
+        restored from the file.
+
+        @param path: the file written by checkpoint.
+        @param initState: a state of the problem searched (e.g., its initial state), used to
+                          rebuild the saved states with from_key.
+        """
+        with gzip.open(path, 'rb') as f:
+            data = pickle.load(f)
+        if data['version'] != _CHECKPOINT_VERSION:
+            raise ValueError("Unknown checkpoint version {} in {}".format(data['version'], path))
+        self.strategy = data['strategy']
+        self.cycle_check = data['cycle_check']
+        self.frontier = data['frontier']
+
+        keys = data['keys']
+        actions = data['actions']
+        states = []
+        depths = []
+        for k, a, gval, p in zip(data['state_key'], data['state_action'], data['state_gval'], data['state_parent']):
+            states.append(initState.from_key(keys[k], actions[a], gval, states[p] if p >= 0 else None))
+            depths.append(depths[p] + 1 if p >= 0 else 0)
+
+        if self.cycle_check == _CC_FULL or self.frontier != _FRONTIER_INDEXED:
+            self.open = Open(self.strategy, self.frontier)
+        else:
+            self.open = Open(self.strategy)
+        incremental_heur_fn = getattr(heur_fn, 'incremental', None)
+        for i, hval in zip(data['open_state'], data['open_hval']):
+            node = sNode(states[i], hval, fval_function)
+            node.depth = depths[i] - depths[data['root']]
+            if incremental_heur_fn:
+                #the caches are not saved, recompute them from scratch
+                node.hcache = incremental_heur_fn(node.state, None, None)[1]
+            self.open.insert(node)
+        root = states[data['root']]
+        self.root = sNode(root, heur_fn(root), fval_function)
+
+        if self.cycle_check == _CC_FULL:
+            self.cc_dictionary = dict(zip(keys, data['cc_gval']))
+            #checkpoints written before states were marked as expanded have no cc_expanded
+            for key, expanded in zip(keys, data.get('cc_expanded') or b''):
+                if expanded:
+                    self.cc_dictionary[key] = _expanded(self.cc_dictionary[key])
+        sNode.n, StateSpace.n, self.cycle_check_pruned, self.cost_bound_pruned = data['counters']
+        self.stats = SearchStats()
+        vars(self.stats).update(data['stats'])
+        StateSpace.successors_pruned = self.stats.successors_pruned
+        self.stale_avoided = self.stats.stale_avoided
+        self.fval_function = fval_function
+        self.goal_fn = goal_fn
+        self.heur_fn = heur_fn
+        self.backward_heur_fn = backward_heur_fn
+
+    def _start_timer(self, timebound):
+        self.search_start_time = os.times()[0]
+        self.search_stop_time = None
+        if timebound:
+            self.search_stop_time = self.search_start_time + timebound
+
+    def _update_stats(self, search_time):
+        '''Copy the counters kept by the engine to self.stats, after searching for search_time seconds'''
+        self.stats.search_time = self.stats.search_time + search_time
+        self.stats.cycle_check_pruned = self.cycle_check_pruned
+        self.stats.cost_bound_pruned = self.cost_bound_pruned
+        self.stats.successors_pruned = StateSpace.successors_pruned
+        if self.open is not None:
+            self.stale_avoided = self.open.stale_avoided()
+            self.stats.stale_avoided = self.stale_avoided
+            if self.cycle_check == _CC_FULL:
+                self.stats.peak_cc_dictionary = len(self.cc_dictionary)
+
+    def _searchOpen(self, goal_fn, heur_fn, fval_function, costbound, depth_limit=None):
         """
         Search, starting from self.open.
 
@@ -384,33 +1242,340 @@ class SearchEngine:
         @param heur_fn: the heuristic function.
         @param fval_function: the f-value function (only relevant when using a custom search strategy).
         @param costbound: the cost bound 3-tuple, as described in the assignment.
+        @param depth_limit: nodes at this depth are not expanded (no limit if None).
         """
+        if self.store is not None:
+            return self._searchOpenStored(goal_fn, heur_fn, costbound, depth_limit)
+        if self.tracer or self.profile or self.on_expand or self.on_generate:
+            return self._searchOpenObserved(goal_fn, heur_fn, costbound, depth_limit)
+        return self._searchOpenFast(goal_fn, heur_fn, costbound, depth_limit)
+
+    def _depth_first_path(self):
+        '''True if path checking can use the set of keys of the current path:
+           OPEN is a stack, so the path to each extracted node is the path
+           to the previous one, cut back to the node's depth, plus the node'''
+        return self.cycle_check == _CC_PATH and self.strategy in [_DEPTH_FIRST, _ITERATIVE_DEEPENING]
+
+    def _searchIterativeDeepening(self, goal_fn, heur_fn, costbound, max_depth):
+        """
+        Iterative deepening depth first search: a sequence of depth first
+        searches from self.root with depth limits 0, 1, 2, ... until one
+        finds a goal, no node is cut by the limit (the space is exhausted),
+        max_depth is reached or the time bound is exceeded.
 
-        #BEGIN TRACING
-        if self.trace:
-            print("   TRACE: Initial OPEN: ", self.open.print_open())
-            if self.cycle_check == _CC_FULL:
-                print("   TRACE: Initial CC_Dict:", self.cc_dictionary)
-        #END TRACING
-        while not self.open.empty():
-            node = self.open.extract()
-
+        @param goal_fn: the goal function.
+        @param heur_fn: the heuristic function (only used for the cost bound).
+        @param costbound: the cost bound 3-tuple, as described in the assignment.
+        @param max_depth: the largest depth limit to try, or None.
+        """
+        limit = 0
+        while max_depth is None or limit <= max_depth:
             #BEGIN TRACING
             if self.trace:
-                print("   TRACE: Next State to expand: <S{}:{}:{}, g={}, h={}, f=g+h={}>".format(
-                    node.state.index, node.state.action, node.state.hashable_state(), node.gval, node.hval, node.gval + node.hval))
-                if node.state.gval != node.gval:
-                    print("ERROR: Node gval not equal to state gval!")
+                print("   TRACE: Iterative deepening with depth limit", limit)
             #END TRACING
+            self.open = Open(_DEPTH_FIRST)
+            self.open.insert(self.root)
+            cut = self.stats.depth_limit_pruned
+            goal_node = self._searchOpen(goal_fn, heur_fn, self.fval_function, costbound, limit)
+            if goal_node:
+                return goal_node
+            if self.stats.depth_limit_pruned == cut:
+                return False
+            if self.search_stop_time and os.times()[0] > self.search_stop_time:
+                return False
+            limit = limit + 1
+        return False
+
+    def _searchOpenFast(self, goal_fn, heur_fn, costbound, depth_limit):
+        """
+        The search loop used when there is nothing to report to: no
+        tracing, no profiling and no hooks. It does exactly the same search
+        as _searchOpenObserved, but the state of the engine is kept in local
+        variables and the counters are only written back to it at the end.
+        """
+        open_ = self.open
+        full_check = self.cycle_check == _CC_FULL
+        path_check = self.cycle_check == _CC_PATH
+        dfs_path = self._depth_first_path()
+        #keys of the states on the path to the node being expanded (depth_first path checking)
+        path_keys = []
+        path_set = set()
+        cc_dictionary = self.cc_dictionary if full_check else None
+        skip_duplicates = full_check and self.skip_duplicates
+        stop_time = self.search_stop_time
+        incremental_heur_fn = getattr(heur_fn, 'incremental', None)
+        batch_heur_fn = None if incremental_heur_fn else getattr(heur_fn, 'batch', None)
+        stats = self.stats
+        expanded = generated = stale_pops = duplicate_pops = 0
+        cycle_check_pruned = cost_bound_pruned = depth_limit_pruned = 0
+        peak_open = stats.peak_open
+
+        try:
+            while open_.open:
+                node = open_.extract()
+                state = node.state
+                if costbound is not None and node.depth and (node.gval > costbound[0] or
+                                                             node.hval > costbound[1] or
+                                                             node.gval + node.hval > costbound[2]):
+                    #the bound was lowered after node was inserted (the root is never pruned)
+                    cost_bound_pruned = cost_bound_pruned + 1
+                    continue
+                if goal_fn(state):
+                    return node
+                if stop_time and os.times()[0] > stop_time:
+                    print("TRACE: Search has exceeeded the time bound provided.")
+                    #leave node on OPEN, so the search can be resumed
+                    open_.insert(node)
+                    return False
+                if full_check:
+                    node_key = state.hashable_state()
+                    reached_gval = cc_dictionary[node_key]
+                    if reached_gval < node.gval:
+                        stale_pops = stale_pops + 1
+                        continue
+                    if skip_duplicates and isinstance(reached_gval, _Expanded):
+                        duplicate_pops = duplicate_pops + 1
+                        #expanding it again would generate the same successors with
+                        #the same gvals (only a depth limit could cut them differently)
+                        if depth_limit is None:
+                            continue
+                elif dfs_path:
+                    while len(path_keys) > node.depth:
+                        path_set.discard(path_keys.pop())
+                    node_key = state.hashable_state()
+                    path_keys.append(node_key)
+                    path_set.add(node_key)
+                if depth_limit is not None and node.depth >= depth_limit:
+                    depth_limit_pruned = depth_limit_pruned + 1
+                    continue
+                if skip_duplicates:
+                    cc_dictionary[node_key] = _expanded(node.gval)
+
+                successors = state.successors()
+                expanded = expanded + 1
+                generated = generated + len(successors)
+                hvals = batch_heur_fn(successors) if batch_heur_fn and successors else None
+
+                for i, succ in enumerate(successors):
+                    if full_check:
+                        hash_state = succ.hashable_state()
+                        old_gval = cc_dictionary.get(hash_state)
+                        if old_gval is not None and (succ.gval > old_gval or
+                                                     (succ.gval == old_gval and skip_duplicates and
+                                                      depth_limit is None and isinstance(old_gval, _Expanded))):
+                            cycle_check_pruned = cycle_check_pruned + 1
+                            continue
+                    elif dfs_path:
+                        if succ.hashable_state() in path_set:
+                            cycle_check_pruned = cycle_check_pruned + 1
+                            continue
+                    elif path_check and succ.has_path_cycle():
+                        cycle_check_pruned = cycle_check_pruned + 1
+                        continue
+
+                    if incremental_heur_fn:
+                        succ_hval, succ_hcache = incremental_heur_fn(succ, succ.action, node.hcache)
+                    elif hvals is not None:
+                        succ_hval = hvals[i]
+                    else:
+                        succ_hval = heur_fn(succ)
+                    if costbound is not None and (succ.gval > costbound[0] or
+                                                  succ_hval > costbound[1] or
+                                                  succ.gval + succ_hval > costbound[2]):
+                        cost_bound_pruned = cost_bound_pruned + 1
+                        continue
+
+                    succ_node = sNode(succ, succ_hval, node.fval_function)
+                    succ_node.depth = node.depth + 1
+                    if incremental_heur_fn:
+                        succ_node.hcache = succ_hcache
+                    open_.insert(succ_node)
+                    if full_check and (old_gval is None or succ.gval < old_gval):
+                        cc_dictionary[hash_state] = succ.gval
+
+                if len(open_.open) > peak_open:
+                    peak_open = len(open_.open)
+            return False
+        finally:
+            stats.expanded = stats.expanded + expanded
+            stats.generated = stats.generated + generated
+            stats.stale_pops = stats.stale_pops + stale_pops
+            stats.duplicate_pops = stats.duplicate_pops + duplicate_pops
+            stats.peak_open = peak_open
+            stats.depth_limit_pruned = stats.depth_limit_pruned + depth_limit_pruned
+            self.cycle_check_pruned = self.cycle_check_pruned + cycle_check_pruned
+            self.cost_bound_pruned = self.cost_bound_pruned + cost_bound_pruned
+
+    def _searchOpenStored(self, goal_fn, heur_fn, costbound, depth_limit):
+        """
+        The search loop of node store mode. It is _searchOpenFast with the
+        nodes on OPEN referring to states in self.store: each state is
+        rebuilt when its node is extracted, its successors are added to the
+        store and then dropped, and the path is only rebuilt for the goal.
+        """
+        open_ = self.open
+        store = self.store
+        full_check = self.cycle_check == _CC_FULL
+        path_check = self.cycle_check == _CC_PATH
+        dfs_path = self._depth_first_path()
+        #keys of the states on the path to the node being expanded (depth_first path checking)
+        path_keys = []
+        path_set = set()
+        cc_dictionary = self.cc_dictionary if full_check else None
+        skip_duplicates = full_check and self.skip_duplicates
+        stop_time = self.search_stop_time
+        incremental_heur_fn = getattr(heur_fn, 'incremental', None)
+        batch_heur_fn = None if incremental_heur_fn else getattr(heur_fn, 'batch', None)
+        stats = self.stats
+        expanded = generated = stale_pops = duplicate_pops = 0
+        cycle_check_pruned = cost_bound_pruned = depth_limit_pruned = 0
+        peak_open = stats.peak_open
+
+        try:
+            while open_.open:
+                node = open_.extract()
+                if costbound is not None and node.depth and (node.gval > costbound[0] or
+                                                             node.hval > costbound[1] or
+                                                             node.gval + node.hval > costbound[2]):
+                    cost_bound_pruned = cost_bound_pruned + 1
+                    continue
+                state = store.state(node.index)
+                if goal_fn(state):
+                    goal_node = sNode(store.path(node.index), node.hval, node.fval_function)
+                    goal_node.hcache = node.hcache
+                    return goal_node
+                if stop_time and os.times()[0] > stop_time:
+                    print("TRACE: Search has exceeeded the time bound provided.")
+                    open_.insert(node)
+                    return False
+                if full_check:
+                    node_key = state.hashable_state()
+                    reached_gval = cc_dictionary[node_key]
+                    if reached_gval < node.gval:
+                        stale_pops = stale_pops + 1
+                        continue
+                    if skip_duplicates and isinstance(reached_gval, _Expanded):
+                        duplicate_pops = duplicate_pops + 1
+                        #expanding it again would generate the same successors with
+                        #the same gvals (only a depth limit could cut them differently)
+                        if depth_limit is None:
+                            continue
+                elif dfs_path:
+                    while len(path_keys) > node.depth:
+                        path_set.discard(path_keys.pop())
+                    node_key = state.hashable_state()
+                    path_keys.append(node_key)
+                    path_set.add(node_key)
+                if depth_limit is not None and node.depth >= depth_limit:
+                    depth_limit_pruned = depth_limit_pruned + 1
+                    continue
+                if skip_duplicates:
+                    cc_dictionary[node_key] = _expanded(node.gval)
+
+                successors = state.successors()
+                expanded = expanded + 1
+                generated = generated + len(successors)
+                hvals = batch_heur_fn(successors) if batch_heur_fn and successors else None
+
+                for i, succ in enumerate(successors):
+                    hash_state = succ.hashable_state()
+                    if full_check:
+                        old_gval = cc_dictionary.get(hash_state)
+                        if old_gval is not None and (succ.gval > old_gval or
+                                                     (succ.gval == old_gval and skip_duplicates and
+                                                      depth_limit is None and isinstance(old_gval, _Expanded))):
+                            cycle_check_pruned = cycle_check_pruned + 1
+                            continue
+                    elif dfs_path:
+                        if hash_state in path_set:
+                            cycle_check_pruned = cycle_check_pruned + 1
+                            continue
+                    elif path_check and store.on_path(node.index, hash_state):
+                        cycle_check_pruned = cycle_check_pruned + 1
+                        continue
+
+                    if incremental_heur_fn:
+                        succ_hval, succ_hcache = incremental_heur_fn(succ, succ.action, node.hcache)
+                    elif hvals is not None:
+                        succ_hval = hvals[i]
+                    else:
+                        succ_hval = heur_fn(succ)
+                    if costbound is not None and (succ.gval > costbound[0] or
+                                                  succ_hval > costbound[1] or
+                                                  succ.gval + succ_hval > costbound[2]):
+                        cost_bound_pruned = cost_bound_pruned + 1
+                        continue
+
+                    succ_node = _StoredNode(store.append(hash_state, succ.gval, node.index, succ.action),
+                                            succ.gval, succ_hval, node.fval_function)
+                    succ_node.depth = node.depth + 1
+                    if incremental_heur_fn:
+                        succ_node.hcache = succ_hcache
+                    open_.insert(succ_node)
+                    if full_check and (old_gval is None or succ.gval < old_gval):
+                        cc_dictionary[hash_state] = succ.gval
+
+                if len(open_.open) > peak_open:
+                    peak_open = len(open_.open)
+            return False
+        finally:
+            stats.expanded = stats.expanded + expanded
+            stats.generated = stats.generated + generated
+            stats.stale_pops = stats.stale_pops + stale_pops
+            stats.duplicate_pops = stats.duplicate_pops + duplicate_pops
+            stats.peak_open = peak_open
+            stats.depth_limit_pruned = stats.depth_limit_pruned + depth_limit_pruned
+            self.cycle_check_pruned = self.cycle_check_pruned + cycle_check_pruned
+            self.cost_bound_pruned = self.cost_bound_pruned + cost_bound_pruned
+
+    def _searchOpenObserved(self, goal_fn, heur_fn, costbound, depth_limit):
+        """
+        The search loop used when tracing, profiling or hooks are on. It
+        reports to self.tracer, calls the hooks and times the operations of
+        the search if profiling.
+        """
+        tracer = self.tracer
+        if tracer:
+            tracer.start(self)
+        stats = self.stats
+        on_expand, on_generate = self.on_expand, self.on_generate
+        skip_duplicates = self.cycle_check == _CC_FULL and self.skip_duplicates
+        incremental_heur_fn = getattr(heur_fn, 'incremental', None)
+        batch_heur_fn = None if incremental_heur_fn else getattr(heur_fn, 'batch', None)
+        insert = lambda node: self.open.insert(node)
+        extract = lambda: self.open.extract()
+        successors_of = lambda state: state.successors()
+        hashable = lambda state: state.hashable_state()
+        if self.profile:
+            insert = _timed(insert, stats, 'time_queue')
+            extract = _timed(extract, stats, 'time_queue')
+            successors_of = _timed(successors_of, stats, 'time_successors')
+            hashable = _timed(hashable, stats, 'time_hashing')
+            heur_fn = _timed(heur_fn, stats, 'time_heuristic')
+            if incremental_heur_fn:
+                incremental_heur_fn = _timed(incremental_heur_fn, stats, 'time_heuristic')
+            if batch_heur_fn:
+                batch_heur_fn = _timed(batch_heur_fn, stats, 'time_heuristic')
+        dfs_path = self._depth_first_path()
+        path_keys = []
+        path_set = set()
+
+        while not self.open.empty():
+            node = extract()
+            if tracer:
+                tracer.extract(self, node)
+            if node.depth and self._over_costbound(node.gval, node.hval, costbound):
+                #the bound was lowered after node was inserted (the root is never pruned)
+                continue
                         
             if goal_fn(node.state):
               #node at front of OPEN is a goal...search is completed.
               return node
 
-            if self.search_stop_time: #timebound check
-              if os.times()[0] > self.search_stop_time:                
-                #exceeded time bound, must terminate search
-                print("TRACE: Search has exceeeded the time bound provided.")
+            if self._time_exceeded():
+                #leave node on OPEN, so the search can be resumed
+                insert(node)
                 return False
 
              #All states reached by a search node on OPEN have already
@@ -419,88 +1584,665 @@ class SearchEngine:
              #an equivalent state with lower g-value. So only expand
              #the node if the hashed g-value is no greater than the
              #node's current g-value. 
+            if self.cycle_check == _CC_FULL:
+                node_key = hashable(node.state)
+                reached_gval = self.cc_dictionary[node_key]
+                if reached_gval < node.gval:
+                    stats.stale_pops = stats.stale_pops + 1
+                    continue
+                if skip_duplicates and isinstance(reached_gval, _Expanded):
+                    stats.duplicate_pops = stats.duplicate_pops + 1
+                    #expanding it again would generate the same successors with
+                    #the same gvals (only a depth limit could cut them differently)
+                    if depth_limit is None:
+                        continue
+            elif dfs_path:
+                while len(path_keys) > node.depth:
+                    path_set.discard(path_keys.pop())
+                node_key = hashable(node.state)
+                path_keys.append(node_key)
+                path_set.add(node_key)
+            if depth_limit is not None and node.depth >= depth_limit:
+                stats.depth_limit_pruned = stats.depth_limit_pruned + 1
+                continue
+            if skip_duplicates:
+                self.cc_dictionary[node_key] = _expanded(node.gval)
+
+            if on_expand:
+                on_expand(node)
+            successors = successors_of(node.state)
+            stats.expanded = stats.expanded + 1
+            stats.generated = stats.generated + len(successors)
+            hvals = batch_heur_fn(successors) if batch_heur_fn and successors else None
+            evaluated = []
+
+            for i, succ in enumerate(successors):
+                if self.cycle_check == _CC_FULL:
+                    hash_state = hashable(succ)
+                    old_gval = self.cc_dictionary.get(hash_state)
+                    prune_succ = old_gval is not None and (succ.gval > old_gval or
+                                                           (succ.gval == old_gval and skip_duplicates and
+                                                            depth_limit is None and isinstance(old_gval, _Expanded)))
+                elif dfs_path:
+                    prune_succ = hashable(succ) in path_set
+                else:
+                    prune_succ = self.cycle_check == _CC_PATH and succ.has_path_cycle()
 
-            #BEGIN TRACING
-            if self.trace:
-                if self.cycle_check == _CC_FULL: print("   TRACE: CC_dict gval={}, node.gval={}".format(
-                    self.cc_dictionary[node.state.hashable_state()], node.gval))
-            #END TRACING
+                if prune_succ :
+                    self.cycle_check_pruned = self.cycle_check_pruned + 1
+                    if tracer:
+                        evaluated.append((succ, None))
+                        tracer.successor(self, succ, None, 'cycle')
+                    continue
 
-            if self.cycle_check == _CC_FULL and self.cc_dictionary[node.state.hashable_state()] < node.gval:
-                continue
+                if incremental_heur_fn:
+                    succ_hval, succ_hcache = incremental_heur_fn(succ, succ.action, node.hcache)
+                elif hvals is not None:
+                    succ_hval = hvals[i]
+                else:
+                    succ_hval = heur_fn(succ)
+                if tracer:
+                    evaluated.append((succ, succ_hval))
+                if self._over_costbound(succ.gval, succ_hval, costbound):
+                    if tracer:
+                        tracer.successor(self, succ, succ_hval, 'costbound')
+                    continue
 
-            successors = node.state.successors()
+                #passed all cycle checks and costbound checks ...add to open
+                succ_node = sNode(succ, succ_hval, node.fval_function)
+                succ_node.depth = node.depth + 1
+                if incremental_heur_fn:
+                    succ_node.hcache = succ_hcache
+                insert(succ_node)
+                if on_generate:
+                    on_generate(node, succ_node)
+                if tracer:
+                    tracer.successor(self, succ, succ_hval, 'open')
+
+                #record cost of this path in dictionary (unless it is no cheaper
+                #than the one recorded, which may be marked as expanded).
+                if self.cycle_check == _CC_FULL and (old_gval is None or succ.gval < old_gval):
+                    self.cc_dictionary[hash_state] = succ.gval
+
+            if tracer:
+                tracer.expanded(self, node, evaluated)
+            if len(self.open.open) > stats.peak_open:
+                stats.peak_open = len(self.open.open)
+
+        #end of while--OPEN is empty and no solution
+        return False
 
+    def _time_exceeded(self):
+        '''Returns True (reporting it) if the time bound of the search has been exceeded'''
+        if self.search_stop_time and os.times()[0] > self.search_stop_time:
+            print("TRACE: Search has exceeeded the time bound provided.")
+            return True
+        return False
+
+    def _over_costbound(self, gval, hval, costbound):
+        '''Returns True (counting it) if a state must be pruned by the cost bound'''
+        if costbound is not None and (gval > costbound[0] or
+                                      hval > costbound[1] or
+                                      gval + hval > costbound[2]):
+            self.cost_bound_pruned = self.cost_bound_pruned + 1
+            return True
+        return False
+
+    def _searchIDA(self, goal_fn, heur_fn, costbound):
+        """
+        Iterative deepening A*: a sequence of depth first searches from
+        self.root, each one bounded by an f-value (gval+hval). The bound of
+        the first iteration is the f-value of the root, and the bound of each
+        following iteration is the lowest f-value that exceeded the previous
+        bound. Memory is proportional to the depth of the search.
+
+        @param goal_fn: the goal function.
+        @param heur_fn: the heuristic function.
+        @param costbound: the cost bound 3-tuple, as described in the assignment.
+        """
+        bound = self.root.gval + self.root.hval
+        while True:
             #BEGIN TRACING
             if self.trace:
-                print("   TRACE: Expanding Node. Successors = {", end="")
-                for ss in successors:                  
-                    print("<S{}:{}:{}, g={}, h={}, f=g+h={}>, ".format(
-                        ss.index, ss.action, ss.hashable_state(), ss.gval, heur_fn(ss), ss.gval+heur_fn(ss)), end="")                    
-                print("}")
+                print("   TRACE: IDA* iteration with f-value bound", bound)
             #END TRACING
+            goal_node, bound = self._searchIDABounded(goal_fn, heur_fn, costbound, bound)
+            if goal_node:
+                return goal_node
+            if bound is None or bound == float('inf'):
+                #out of time, or no state was cut by the bound: the space is exhausted
+                return False
+
+    def _searchIDABounded(self, goal_fn, heur_fn, costbound, bound):
+        """
+        One iteration of IDA*: depth first search from self.root, not
+        expanding nodes with f-value over bound. The stack holds, for each
+        node on the current path, the successors not yet visited.
 
+        Returns (goal node, None) if a goal is found, (False, None) if the
+        time bound is exceeded, and (False, next bound) otherwise.
+        """
+        next_bound = float('inf')
+        path_check = self.cycle_check == _CC_PATH
+        stats = self.stats
+        on_expand, on_generate = self.on_expand, self.on_generate
+        incremental_heur_fn = getattr(heur_fn, 'incremental', None)
+        on_path = set()
+        stack = []
+        node = self.root
+        while True:
+            if node is not None:
+                fval = node.gval + node.hval
+                if fval > bound:
+                    next_bound = min(next_bound, fval)
+                elif goal_fn(node.state):
+                    return node, None
+                else:
+                    if self._time_exceeded():
+                        return False, None
+                    key = node.state.hashable_state() if path_check else None
+                    on_path.add(key)
+                    if on_expand:
+                        on_expand(node)
+                    successors = node.state.successors()
+                    stats.expanded = stats.expanded + 1
+                    stats.generated = stats.generated + len(successors)
+                    stack.append((node, key, iter(successors)))
+
+            if not stack:
+                return False, next_bound
+
+            parent, _, successors = stack[-1]
+            node = None
             for succ in successors:
-                hash_state = succ.hashable_state()
-                if self.trace > 1: 
-                  if self.cycle_check == _CC_FULL and hash_state in self.cc_dictionary:
-                      print("   TRACE: Already in CC_dict, CC_dict gval={}, successor state gval={}".format(
-                        self.cc_dictionary[hash_state], succ.gval))   
-
-                #BEGIN TRACING
-                if self.trace > 1:
-                    print("   TRACE: Successor State:", end="")
-                    succ.print_state()
-                    print("   TRACE: Heuristic Value:", heur_fn(succ))
-
-                    if self.cycle_check == _CC_FULL and hash_state in self.cc_dictionary:
-                        print("   TRACE: Already in CC_dict, CC_dict gval={}, successor state gval={}".format(
-                            self.cc_dictionary[hash_state], succ.gval))
-
-                    if self.cycle_check == _CC_PATH and succ.has_path_cycle():
-                        print("   TRACE: On cyclic path")
-                #END TRACING
-
-                prune_succ = (self.cycle_check == _CC_FULL and
-                              hash_state in self.cc_dictionary and
-                              succ.gval > self.cc_dictionary[hash_state]
-                             ) or (
-                              self.cycle_check == _CC_PATH and
-                              succ.has_path_cycle()
-                             )
+                if path_check and succ.hashable_state() in on_path:
+                    self.cycle_check_pruned = self.cycle_check_pruned + 1
+                    continue
+                if incremental_heur_fn:
+                    succ_hval, succ_hcache = incremental_heur_fn(succ, succ.action, parent.hcache)
+                else:
+                    succ_hval = heur_fn(succ)
+                if self._over_costbound(succ.gval, succ_hval, costbound):
+                    continue
+                node = sNode(succ, succ_hval, parent.fval_function)
+                if incremental_heur_fn:
+                    node.hcache = succ_hcache
+                if on_generate:
+                    on_generate(parent, node)
+                break
+            if node is None:
+                #all successors visited, backtrack
+                _, key, _ = stack.pop()
+                on_path.discard(key)
+
+    def _searchRBFS(self, goal_fn, heur_fn, costbound):
+        """
+        Recursive best first search from self.root. Like A*, it expands
+        nodes in best first order of their f-values, but it only keeps the
+        current path and the siblings of its nodes, backing up the best
+        f-value of forgotten subtrees so they can be regenerated later.
+        Memory is proportional to the depth of the search.
 
-                if prune_succ :
+        @param goal_fn: the goal function.
+        @param heur_fn: the heuristic function.
+        @param costbound: the cost bound 3-tuple, as described in the assignment.
+        """
+        path_check = self.cycle_check == _CC_PATH
+        stats = self.stats
+        on_expand, on_generate = self.on_expand, self.on_generate
+        on_path = set()
+        counter = itertools.count()
+        incremental_heur_fn = getattr(heur_fn, 'incremental', None)
+        batch_heur_fn = None if incremental_heur_fn else getattr(heur_fn, 'batch', None)
+
+        def rbfs(node, node_f, f_limit):
+            '''Returns (goal node, None), (False, None) on timeout,
+               or (None, backed up f-value of node)'''
+            if goal_fn(node.state):
+                return node, None
+            if self._time_exceeded():
+                return False, None
+
+            key = node.state.hashable_state() if path_check else None
+            on_path.add(key)
+            children = []
+            if on_expand:
+                on_expand(node)
+            successors = node.state.successors()
+            stats.expanded = stats.expanded + 1
+            stats.generated = stats.generated + len(successors)
+            hvals = batch_heur_fn(successors) if batch_heur_fn and successors else None
+            for i, succ in enumerate(successors):
+                if path_check and succ.hashable_state() in on_path:
                     self.cycle_check_pruned = self.cycle_check_pruned + 1
-                    #BEGIN TRACING
-                    if self.trace > 1:
-                        print(" TRACE: Successor State pruned by cycle checking")
-                        print("\n")                        
-                    #END TRACING
                     continue
+                if incremental_heur_fn:
+                    succ_hval, succ_hcache = incremental_heur_fn(succ, succ.action, node.hcache)
+                elif hvals is not None:
+                    succ_hval = hvals[i]
+                else:
+                    succ_hval = heur_fn(succ)
+                if self._over_costbound(succ.gval, succ_hval, costbound):
+                    continue
+                child = sNode(succ, succ_hval, node.fval_function)
+                if incremental_heur_fn:
+                    child.hcache = succ_hcache
+                if on_generate:
+                    on_generate(node, child)
+                #children inherit the backed up f-value of their parent
+                child_f = max(child.gval + child.hval, node_f)
+                children.append([child_f, -child.gval, next(counter), child])
+
+            result = (None, float('inf'))
+            while children:
+                children.sort()
+                best = children[0]
+                if best[0] > f_limit:
+                    result = (None, best[0])
+                    break
+                alternative = children[1][0] if len(children) > 1 else float('inf')
+                goal_node, best[0] = rbfs(best[3], best[0], min(f_limit, alternative))
+                if goal_node is not None:
+                    result = (goal_node, None)
+                    break
+            on_path.discard(key)
+            return result
+
+        goal_node, _ = rbfs(self.root, self.root.gval + self.root.hval, float('inf'))
+        return goal_node if goal_node else False
+
+    def _solution_cost_bound(self, costbound):
+        '''Bidirectional searches apply the cost bound to whole solutions:
+           no solution may cost more than its gval or fval bounds.'''
+        if costbound is None:
+            return float('inf')
+        return min(costbound[0], costbound[2])
+
+    def _join_paths(self, forward, backward):
+        '''Returns a copy of the goal reached by following the backward
+           search path of backward (a state equal to forward) from the end
+           of the forward search path of forward, so that the parent chain
+           of the result is the whole solution from the initial state.'''
+        state = forward
+        while backward.parent is not None:
+            nxt = copy.copy(backward.parent)
+            nxt.action = backward.action
+            nxt.gval = state.gval + (backward.gval - backward.parent.gval)
+            nxt.parent = state
+            state = nxt
+            backward = backward.parent
+        return state
+
+    def _searchHDA(self, goal_fn, heur_fn, costbound, timebound):
+        """
+        Hash distributed A*: starts self.workers processes (see _hda_worker),
+        each running A* on the states it owns, which exchange the successors
+        they generate in batches through multiprocessing queues. A worker
+        keeps expanding after finding a goal, until no worker has a node
+        with fval lower than the cheapest goal found, so with an admissible
+        heuristic the solution is optimal, as with astar.
+
+        The states must have picklable keys and implement from_key, and
+        initState, goal_fn and heur_fn must be picklable unless processes
+        are forked. The time bound applies to the CPU time of each worker,
+        and to the wall clock time of the whole search. If a worker dies
+        (e.g., its heuristic raises an exception) the search fails, and the
+        other workers are terminated.
 
-                succ_hval = heur_fn(succ)
-                if costbound is not None and (succ.gval > costbound[0] or
-                                              succ_hval > costbound[1] or
-                                              succ.gval + succ_hval > costbound[2]) : 
-                    self.cost_bound_pruned = self.cost_bound_pruned + 1
-                    if self.trace > 1:
-                      print(" TRACE: Successor State pruned, over current cost bound of {}", costbound)
-                      print("\n") 
-                    continue                    
+        @param goal_fn: the goal function for the puzzle
+        @param heur_fn: the heuristic function (batch and incremental versions are not used).
+        @param costbound: the cost bound 3-tuple, as described in the assignment.
+        @param timebound: the maximum amount of time, in seconds, each worker may search.
+        """
+        workers = self.workers or os.cpu_count() or 1
+        inboxes = [multiprocessing.Queue() for _ in range(workers)]
+        results = multiprocessing.Queue()
+        #the values are only written holding lock
+        lock = multiprocessing.Lock()
+        shared = (multiprocessing.Value('d', float('inf'), lock=False), multiprocessing.Value('i', -1, lock=False),
+                  multiprocessing.Value('b', 0, lock=False), multiprocessing.Value('b', 0, lock=False), lock,
+                  multiprocessing.Array('q', workers, lock=False), multiprocessing.Array('q', workers, lock=False),
+                  multiprocessing.Array('b', workers, lock=False))
+        incumbent, winner, done, stop = shared[:4]
+        init = self.root.state
+        processes = [multiprocessing.Process(target=_hda_worker, daemon=True,
+                                             args=(me, workers, init, goal_fn, heur_fn, costbound, timebound,
+                                                   inboxes, results, shared))
+                     for me in range(workers)]
+        for process in processes:
+            process.start()
+        deadline = time.perf_counter() + timebound if timebound else None
+
+        goal_node = False
+        reported = 0
+        try:
+            goal_keys = [None]*workers
+            while reported < workers:
+                message = _hda_receive(results, processes, stop, deadline)
+                if message is None:
+                    return False
+                reported = reported + 1
+                _, me, goal_key, counts = message
+                goal_keys[me] = goal_key
+                self.stats.expanded = self.stats.expanded + counts['expanded']
+                self.stats.generated = self.stats.generated + counts['generated']
+                self.stats.stale_pops = self.stats.stale_pops + counts['stale_pops']
+                self.stats.peak_open = self.stats.peak_open + counts['peak_open']
+                StateSpace.successors_pruned = StateSpace.successors_pruned + counts['successors_pruned']
+                self.cycle_check_pruned = self.cycle_check_pruned + counts['cycle_check_pruned']
+                self.cost_bound_pruned = self.cost_bound_pruned + counts['cost_bound_pruned']
+            sNode.n = sNode.n + self.stats.expanded
+
+            if stop.value:
+                print("TRACE: Search has exceeeded the time bound provided.")
+            elif winner.value >= 0:
+                #follow the parent keys back to the initial state, asking the owner of each state
+                path = []
+                key = goal_keys[winner.value]
+                while key is not None:
+                    inboxes[_hda_owner(key, workers)].put(('trace', key))
+                    message = _hda_receive(results, processes, stop, None)
+                    if message is None:
+                        return False
+                    gval, parent_key, action = message[1]
+                    path.append((key, action, gval))
+                    key = parent_key
+                state = init
+                for key, action, gval in reversed(path[:-1]):
+                    state = init.from_key(key, action, gval, state)
+                goal_node = sNode(state, 0, self.fval_function)
+        finally:
+            if reported == workers:
+                #the workers are done searching, and wait for ('stop',)
+                for q in inboxes:
+                    q.put(('stop',))
+                for process in processes:
+                    process.join(_HDA_GRACE)
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()
+                process.join()
+        return goal_node
+
+    def _searchBidirectionalBFS(self, goal_fn, costbound):
+        """
+        Bidirectional breadth first search: expands, one whole layer at a
+        time, the smallest of the forward frontier (from self.root) and the
+        backward frontier (from the goal states). Once a layer generates a
+        state already reached by the other search, the cheapest of the
+        paths joined in that layer is returned.
+
+        @param goal_fn: the goal function (used to check the initial state).
+        @param costbound: the cost bound 3-tuple, applied to whole solutions.
+        """
+        bound = self._solution_cost_bound(costbound)
+        init = self.root.state
+        if goal_fn(init):
+            return self.root
+        goals = init.goal_states()
+        reached = [{init.hashable_state(): init}, dict((g.hashable_state(), g) for g in goals)]
+        frontiers = [[init], goals]
+        while frontiers[0] and frontiers[1]:
+            if self._time_exceeded():
+                return False
+            side = 0 if len(frontiers[0]) <= len(frontiers[1]) else 1
+            own, other = reached[side], reached[1 - side]
+            best = None
+            layer = []
+            for state in frontiers[side]:
+                sNode.n = sNode.n + 1
+                successors = state.successors() if side == 0 else state.predecessors()
+                self.stats.expanded = self.stats.expanded + 1
+                self.stats.generated = self.stats.generated + len(successors)
+                for succ in successors:
+                    key = succ.hashable_state()
+                    if key in own:
+                        self.cycle_check_pruned = self.cycle_check_pruned + 1
+                        continue
+                    if succ.gval > bound:
+                        self.cost_bound_pruned = self.cost_bound_pruned + 1
+                        continue
+                    own[key] = succ
+                    layer.append(succ)
+                    if key in other:
+                        cost = succ.gval + other[key].gval
+                        if cost <= bound and (best is None or cost < best[0]):
+                            best = (cost, succ, other[key]) if side == 0 else (cost, other[key], succ)
+            self.stats.peak_cc_dictionary = len(reached[0]) + len(reached[1])
+            if best:
+                return sNode(self._join_paths(best[1], best[2]), 0, self.fval_function)
+            frontiers[side] = layer
+        return False
 
-                #passed all cycle checks and costbound checks ...add to open
-                self.open.insert(sNode(succ, succ_hval, node.fval_function))
+    def _searchBidirectionalAstar(self, goal_fn, heur_fn, backward_heur_fn, costbound):
+        """
+        Front-to-end bidirectional A*: a forward A* from self.root guided by
+        heur_fn and a backward A* from the goal states guided by
+        backward_heur_fn, expanding each time from the side with the smaller
+        OPEN. Every generated state is checked against the states reached by
+        the other side, keeping the cheapest solution found so far (mu). The
+        search stops once mu is no greater than the lowest fval of either
+        OPEN, which proves mu optimal if both heuristics are admissible.
+
+        @param goal_fn: the goal function (used to check the initial state).
+        @param heur_fn: estimate of the distance to a goal, for the forward search.
+        @param backward_heur_fn: estimate of the distance from the initial state, for the backward search.
+        @param costbound: the cost bound 3-tuple, applied to whole solutions.
+        """
+        bound = self._solution_cost_bound(costbound)
+        init = self.root.state
+        if goal_fn(init):
+            return self.root
+        heuristics = [heur_fn, backward_heur_fn]
+        opens = [Open(_ASTAR), Open(_ASTAR)]
+        reached = [dict(), dict()]
+        opens[0].insert(self.root)
+        reached[0][init.hashable_state()] = init
+        for goal in init.goal_states():
+            opens[1].insert(sNode(goal, backward_heur_fn(goal), self.fval_function))
+            reached[1][goal.hashable_state()] = goal
+
+        mu = float('inf')
+        best = None
+        while not opens[0].empty() and not opens[1].empty():
+            if mu <= max(opens[0].min_priority()[0], opens[1].min_priority()[0]):
+                break
+            if self._time_exceeded():
+                return False
+            side = 0 if len(opens[0].open) <= len(opens[1].open) else 1
+            own, other = reached[side], reached[1 - side]
+            node = opens[side].extract()
+            if own[node.state.hashable_state()].gval < node.gval:
+                #stale node, its state was reached again by a cheaper path
+                self.stats.stale_pops = self.stats.stale_pops + 1
+                continue
+            successors = node.state.successors() if side == 0 else node.state.predecessors()
+            self.stats.expanded = self.stats.expanded + 1
+            self.stats.generated = self.stats.generated + len(successors)
+            for succ in successors:
+                key = succ.hashable_state()
+                if key in own and own[key].gval <= succ.gval:
+                    self.cycle_check_pruned = self.cycle_check_pruned + 1
+                    continue
+                succ_hval = heuristics[side](succ)
+                if succ.gval + succ_hval >= mu or succ.gval + succ_hval > bound:
+                    #can not lead to a solution cheaper than mu, or within the cost bound
+                    self.cost_bound_pruned = self.cost_bound_pruned + 1
+                    continue
+                own[key] = succ
+                opens[side].insert(sNode(succ, succ_hval, node.fval_function))
+                if key in other and succ.gval + other[key].gval < mu:
+                    mu = succ.gval + other[key].gval
+                    best = (succ, other[key]) if side == 0 else (other[key], succ)
+            self.stats.peak_open = max(self.stats.peak_open, len(opens[0].open) + len(opens[1].open))
+            self.stats.peak_cc_dictionary = len(reached[0]) + len(reached[1])
+        if best is None or mu > bound:
+            return False
+        return sNode(self._join_paths(best[0], best[1]), 0, self.fval_function)
 
-                #BEGIN TRACING
-                if self.trace > 1:
-                    print(" TRACE: Successor State added to OPEN")
-                    print("\n")
-                #END TRACING
 
-                #record cost of this path in dictionary.
-                if self.cycle_check == _CC_FULL:
-                    self.cc_dictionary[hash_state] = succ.gval
+def _hda_owner(key, workers):
+    '''The hdastar worker that owns the state whose hashable_state is key.
+       crc32 gives the same owner in every process (hash() is salted per process).'''
+    return zlib.crc32(key if isinstance(key, bytes) else pickle.dumps(key)) % workers
 
-        #end of while--OPEN is empty and no solution
-        return False
-            
+def _hda_receive(results, processes, stop, deadline):
+    '''
+    The next message of the hdastar workers on results, or None (reporting
+    it) if a worker died without sending it, or if it did not come within
+    _HDA_GRACE seconds of asking the workers to stop (through the shared
+    stop flag) when the deadline (a time.perf_counter() value, or None) passed.
+    '''
+    while True:
+        try:
+            return results.get(timeout=_HDA_POLL)
+        except queue.Empty:
+            pass
+        dead = [process for process in processes if not process.is_alive()]
+        if dead:
+            #workers only exit when the parent stops them, but a message sent
+            #just before one died may still be on its way
+            try:
+                return results.get(timeout=_HDA_POLL)
+            except queue.Empty:
+                print('A hdastar worker exited with code', dead[0].exitcode, 'before the search was over')
+                return None
+        if deadline is not None and time.perf_counter() > deadline:
+            stop.value = 1
+            if time.perf_counter() > deadline + _HDA_GRACE:
+                print('The hdastar workers did not stop', _HDA_GRACE, 'seconds after the time bound')
+                return None
+
+def _hda_worker(me, workers, initState, goal_fn, heur_fn, costbound, timebound, inboxes, results, shared):
+    """
+    A worker process of hdastar: A* over the states it owns (see _hda_owner).
+
+    Successors owned by other workers are buffered and sent to their inboxes
+    in batches of (key, action, gval, parent key) tuples, and rebuilt there
+    with initState.from_key. Each worker keeps the cheapest gval, parent key
+    and action of every state it inserted into its OPEN, which serves both
+    as its cycle check dictionary and to rebuild the solution path.
+
+    Goals extracted from OPEN update the shared incumbent (the cost of the
+    best solution found), and nodes with fval = gval+hval no lower than it
+    are pruned. The search is over when every worker is idle (nothing below
+    the incumbent on its OPEN and nothing buffered) and every batch sent
+    has been received. Then the worker puts its statistics on results and
+    answers ('trace', key) requests of the parent with the entry of key,
+    until it gets ('stop',).
+    """
+    incumbent, winner, done, stop, lock, sent, received, idle = shared
+    inbox = inboxes[me]
+    for q in inboxes:
+        #batches left on the queues when the search stops may be dropped
+        q.cancel_join_thread()
+    start = os.times()[0]
+    best = dict()
+    open = []
+    counter = itertools.count()
+    outboxes = [[] for _ in range(workers)]
+    counts = dict(expanded=0, generated=0, cycle_check_pruned=0, cost_bound_pruned=0, stale_pops=0, peak_open=0)
+    #the count of successors_pruned inherited from the parent is its own
+    StateSpace.successors_pruned = 0
+    goal_key = None
+    bound = float('inf')
+
+    def reach(key, action, gval, parent_key, state):
+        old = best.get(key)
+        if old is not None and old[0] <= gval:
+            counts['cycle_check_pruned'] = counts['cycle_check_pruned'] + 1
+            return
+        if state is None:
+            state = initState.from_key(key, action, gval, None)
+        hval = heur_fn(state)
+        #as in the other strategies, the cost bound is not applied to the root
+        if gval + hval >= bound or (costbound is not None and parent_key is not None and
+                                    (gval > costbound[0] or hval > costbound[1] or
+                                     gval + hval > costbound[2])):
+            counts['cost_bound_pruned'] = counts['cost_bound_pruned'] + 1
+            return
+        best[key] = (gval, parent_key, action)
+        heapq.heappush(open, (gval + hval, -gval, next(counter), key, state))
+
+    def flush(dest):
+        with lock:
+            sent[me] = sent[me] + 1
+        inboxes[dest].put(('nodes', outboxes[dest]))
+        outboxes[dest] = []
+
+    def receive(message):
+        with lock:
+            received[me] = received[me] + 1
+            idle[me] = 0
+        for key, action, gval, parent_key in message[1]:
+            reach(key, action, gval, parent_key, None)
+
+    root_key = initState.hashable_state()
+    if _hda_owner(root_key, workers) == me:
+        reach(root_key, initState.action, initState.gval, None, initState)
+
+    while not done.value and not stop.value:
+        while True:
+            try:
+                receive(inbox.get_nowait())
+            except queue.Empty:
+                break
+        bound = incumbent.value
+        if open and open[0][0] < bound:
+            for _ in range(_HDA_BATCH):
+                bound = incumbent.value
+                if not open or open[0][0] >= bound:
+                    break
+                fval, neg_gval, _, key, state = heapq.heappop(open)
+                gval = -neg_gval
+                if best[key][0] < gval:
+                    #stale node, its state was reached again by a cheaper path
+                    counts['stale_pops'] = counts['stale_pops'] + 1
+                    continue
+                if goal_fn(state):
+                    with lock:
+                        if gval < incumbent.value:
+                            incumbent.value = gval
+                            winner.value = me
+                            goal_key = key
+                    continue
+                successors = state.successors()
+                counts['expanded'] = counts['expanded'] + 1
+                counts['generated'] = counts['generated'] + len(successors)
+                for succ in successors:
+                    succ_key = succ.hashable_state()
+                    #only the key is needed to rebuild the path, let the parent go
+                    succ.parent = None
+                    dest = _hda_owner(succ_key, workers)
+                    if dest == me:
+                        reach(succ_key, succ.action, succ.gval, key, succ)
+                    else:
+                        outboxes[dest].append((succ_key, succ.action, succ.gval, key))
+                        if len(outboxes[dest]) >= _HDA_BATCH:
+                            flush(dest)
+            counts['peak_open'] = max(counts['peak_open'], len(open))
+            if timebound and os.times()[0] - start > timebound:
+                stop.value = 1
+            for dest in range(workers):
+                if outboxes[dest]:
+                    flush(dest)
+        else:
+            #every node left on OPEN can not improve on the incumbent
+            del open[:]
+            with lock:
+                idle[me] = 1
+                if sum(idle) == workers and sum(sent) == sum(received):
+                    done.value = 1
+            try:
+                receive(inbox.get(timeout=_HDA_WAIT))
+            except queue.Empty:
+                pass
+
+    counts['successors_pruned'] = StateSpace.successors_pruned
+    results.put(('stats', me, goal_key, counts))
+    while True:
+        message = inbox.get()
+        if message[0] == 'trace':
+            results.put(('trace', best[message[1]]))
+        elif message[0] == 'stop':
+            return
@@ -4,6 +4,22 @@
 
     A specializion of the StateSpace Class that is tailored to the game of Sliders.
 
+    B) Class PackedSlidersState
+
+    A compact variant of SlidersState that keeps the board packed into a
+    bytes object (one byte per tile, row major order). Successors are built
+    by slicing and rotating the bytes directly, and the packed board is used
+    as the hash key, so no NumPy arrays are created during the search.
+
+    Both classes can skip redundant moves when generating successors (see
+    SlidersState.pruned_moves), turned on with
+    SlidersState.move_pruning = True. The moves skipped are counted in the
+    successors_pruned statistic of the search (see SearchStats).
+
+    Slides are stored in the states as small integer codes (see
+    sliders_action_code); the action labels (e.g., LEFT-2) are only
+    formatted when the action attribute is read, e.g., to print a path.
+
 
     Code also contains a list of some sliders problems for the purpose of testing.
 '''
@@ -13,6 +29,9 @@ from search import *
 
 
 class SlidersState(StateSpace):
+    #Skip the moves given by pruned_moves when generating successors.
+    move_pruning = False
+
     def __init__(self, action, gval, parent, width, height, tiles):
         '''
         Creates a new Sliders state.
@@ -25,26 +44,89 @@ class SlidersState(StateSpace):
         self.height = height
         self.tiles = tiles
 
-    def successors(self):
+    @property
+    def action(self):
+        '''The label of the action that generated this state (e.g., LEFT-2), formatted on demand.'''
+        code = self.code
+        if code.__class__ is int:
+            return sliders_action_label(code)
+        return code
+
+    @action.setter
+    def action(self, action):
+        #slides are kept as codes, other labels (START, GOAL) as they are
+        if action.__class__ is int or action.split("-")[0] not in _DIRECTION_CODE:
+            self.code = action
+        else:
+            self.code = sliders_action_code(*sliders_parse_action(action))
+
+    def successors(self, move_pruning=None):
         '''
         Generates all the actions that can be performed from this state, and the states those actions will create.        
+        @param move_pruning: Skip the moves given by pruned_moves (by default, if the class attribute move_pruning is set).
         '''
         successors = []
         transition_cost = 1
+        pruned = self.pruned_moves() if (self.move_pruning if move_pruning is None else move_pruning) else ()
 
         for row in range(self.height): 
             for direction in ('LEFT', 'RIGHT'):
-                new_state = SlidersState(direction+"-"+str(row), self.gval + transition_cost, self, self.width, self.height, self.slide(direction, row) )
+                code = row*4 + _DIRECTION_CODE[direction]
+                if code in pruned:
+                    continue
+                new_state = SlidersState(code, self.gval + transition_cost, self, self.width, self.height, self.slide(direction, row) )
                 successors.append(new_state)
                 #print(self.slide(direction, row))
 
         for column in range(self.width): 
             for direction in ('UP', 'DOWN'):
-                new_state = SlidersState(direction+"-"+str(row), self.gval + transition_cost, self, self.width, self.height, self.slide(direction, column) )
+                code = column*4 + _DIRECTION_CODE[direction]
+                if code in pruned:
+                    continue
+                new_state = SlidersState(code, self.gval + transition_cost, self, self.width, self.height, self.slide(direction, column) )
                 successors.append(new_state)
                 #print( self.slide(direction, column))
         return successors
 
+    def pruned_moves(self):
+        '''
+        The set of moves, as action codes (see sliders_action_code), that are skipped
+        when generating the successors of this state with move pruning. Each
+        one starts, after the action that generated this state, a sequence of
+        two moves whose result is also reached by a sequence that is not
+        pruned and is no longer, so the pruning keeps a shortest path to
+        every state:
+        - the inverse of the last move, which undoes it.
+        - Any other move of the same line if it has 2 or 3 tiles, since two
+          slides of it equal no slide or one slide the other way; on a line
+          of 4 tiles only RIGHT (DOWN) after RIGHT (DOWN), which equals LEFT
+          twice (UP twice).
+        - Moves of a lower row after a row move, and of a lower column after
+          a column move. Slides of different rows (columns) commute, so
+          only the order with increasing rows (columns) is kept.
+        - RIGHT moves on boards of width 2 and DOWN moves on boards of height
+          2, which give the same boards as LEFT and UP moves.
+        '''
+        pruned = set()
+        if self.width == 2:
+            pruned.update(row*4 + 1 for row in range(self.height))
+        if self.height == 2:
+            pruned.update(column*4 + 3 for column in range(self.width))
+        code = self.code
+        if code.__class__ is int:
+            #moves of the same line differ only in the low bit of their codes
+            line, direction = code >> 2, code & 3
+            size = self.width if direction < 2 else self.height
+            first = code & ~1
+            pruned.add(code ^ 1)
+            if size <= 3:
+                pruned.update((first, first + 1))
+            elif size == 4 and direction & 1:
+                pruned.add(code)
+            pruned.update(lower*4 + (direction & 2) + move for lower in range(line) for move in (0, 1))
+        StateSpace.successors_pruned = StateSpace.successors_pruned + len(pruned)
+        return pruned
+
 
     def slide(self, direction, row_or_column):
         estado = np.copy(self.tiles)
@@ -63,12 +145,35 @@ class SlidersState(StateSpace):
 
     def hashable_state(self):
         '''Return a data item that can be used as a dictionary key to UNIQUELY represent a state.'''
-        #return hash(str(self.tiles)) 
-        return   hash(self.state_string())
+        #The packed board is an exact key (hash(str(self.tiles)) could collide, and
+        #str() elides the content of large arrays). It is the same key used by
+        #PackedSlidersState, so both kinds of states can share a cc_dictionary.
+        return sliders_pack_tiles(self.tiles)
 
     def state_string(self):
         return str(self.tiles)
 
+    def from_key(self, key, action, gval, parent):
+        '''The board of the same size as self whose hashable_state is key.'''
+        tiles = np.frombuffer(key, dtype=np.uint8).reshape(self.height, self.width).astype(int)
+        return type(self)(action, gval, parent, self.width, self.height, tiles)
+
+    def goal_states(self):
+        '''The only goal is the board with its tiles in order.'''
+        return [self.from_key(sliders_goal_key(self.width, self.height), "GOAL", 0, None)]
+
+    def predecessors(self):
+        '''
+        Every slide is undone by sliding the same row or column in the opposite
+        direction, so the predecessors of a board are its successors, each
+        labelled with the inverse of the slide that generated it.
+        '''
+        predecessors = self.successors(move_pruning=False)
+        for state in predecessors:
+            #the code of the inverse slide only differs in the low bit
+            state.code = state.code ^ 1
+        return predecessors
+
     def print_state(self):
         '''
         Prints the string representation of the state. ASCII art FTW!
@@ -77,16 +182,131 @@ class SlidersState(StateSpace):
         print(self.state_string())
 
 
+class PackedSlidersState(SlidersState):
+    def __init__(self, action, gval, parent, width, height, tiles):
+        '''
+        Creates a new packed Sliders state.
+        @param width: The room's X dimension (excluding walls).
+        @param height: The room's Y dimension (excluding walls).
+        @param tiles: The packed board (bytes), or an array of tiles that will be packed.
+        '''
+        StateSpace.__init__(self, action, gval, parent)
+        self.width = width
+        self.height = height
+        if isinstance(tiles, bytes):
+            self.packed = tiles
+        else:
+            self.packed = sliders_pack_tiles(tiles)
+
+    @property
+    def tiles(self):
+        '''The board as a (height, width) NumPy array, unpacked on demand.'''
+        return np.frombuffer(self.packed, dtype=np.uint8).reshape(self.height, self.width).astype(int)
+
+    def successors(self, move_pruning=None):
+        '''
+        Generates the same successors as SlidersState.successors, rotating
+        the packed board instead of copying and rolling NumPy arrays.
+        '''
+        successors = []
+        transition_cost = 1
+        gval = self.gval + transition_cost
+        width = self.width
+        packed = self.packed
+        pruned = self.pruned_moves() if (self.move_pruning if move_pruning is None else move_pruning) else ()
+
+        for row in range(self.height):
+            start = row*width
+            end = start + width
+            line = packed[start:end]
+            code = row*4
+            if code not in pruned:
+                successors.append(PackedSlidersState(code, gval, self, width, self.height,
+                                                     packed[:start] + line[1:] + line[:1] + packed[end:]))
+            if code + 1 not in pruned:
+                successors.append(PackedSlidersState(code + 1, gval, self, width, self.height,
+                                                     packed[:start] + line[-1:] + line[:-1] + packed[end:]))
+
+        for column in range(width):
+            line = packed[column::width]
+            board = bytearray(packed)
+            code = column*4 + 2
+            if code not in pruned:
+                board[column::width] = line[1:] + line[:1]
+                successors.append(PackedSlidersState(code, gval, self, width, self.height, bytes(board)))
+            if code + 1 not in pruned:
+                board[column::width] = line[-1:] + line[:-1]
+                successors.append(PackedSlidersState(code + 1, gval, self, width, self.height, bytes(board)))
+        return successors
+
+    def hashable_state(self):
+        '''The packed board already is an immutable and unique key.'''
+        return self.packed
+
+    def from_key(self, key, action, gval, parent):
+        '''The board of the same size as self whose packed board is key.'''
+        return PackedSlidersState(action, gval, parent, self.width, self.height, key)
+
+
+#Directions in the order of their action codes; inverse directions differ in the low bit.
+_DIRECTIONS = ('LEFT', 'RIGHT', 'UP', 'DOWN')
+_DIRECTION_CODE = dict((direction, code) for code, direction in enumerate(_DIRECTIONS))
+
+#Labels of the slide codes, formatted once per code.
+_LABELS = {}
+
+#Packed goal boards, by (width, height).
+_GOAL_KEYS = {}
+
+def sliders_action_code(direction, line):
+    '''Returns the code of a slide: 4 times its row or column plus the index of its direction in _DIRECTIONS.'''
+    return line*4 + _DIRECTION_CODE[direction]
+
+def sliders_action_label(code):
+    '''Returns the label of a slide code (e.g., LEFT-2 for 8).'''
+    label = _LABELS.get(code)
+    if label is None:
+        label = _LABELS[code] = _DIRECTIONS[code & 3] + "-" + str(code >> 2)
+    return label
+
+def sliders_parse_action(action):
+    '''Returns the direction and the row or column of a slide label (e.g., ('LEFT', 2) for LEFT-2).'''
+    direction, line = action.split("-")
+    return direction, int(line)
+
+def sliders_pack_tiles(tiles):
+    '''Packs a board of tiles into a bytes object, one byte per tile in row major order.'''
+    tiles = np.asarray(tiles)
+    if tiles.size and tiles.max() > 255:
+        raise ValueError("Boards with more than 256 tiles can not be packed.")
+    return tiles.astype(np.uint8).tobytes()
+
+def sliders_packed_state(state):
+    '''Returns a PackedSlidersState equivalent to the given sliders state.'''
+    return PackedSlidersState(state.action, state.gval, state.parent, state.width, state.height, state.tiles)
+
+
+def sliders_stack(states):
+    '''Returns the boards of states (all of the same size) as one (k, height, width) array.'''
+    first = states[0]
+    boards = b"".join(state.hashable_state() for state in states)
+    return np.frombuffer(boards, dtype=np.uint8).reshape(len(states), first.height, first.width).astype(int)
+
+
+def sliders_goal_key(width, height):
+    '''Returns the packed goal board (tiles in order) of the given size, built once per size.'''
+    key = _GOAL_KEYS.get((width, height))
+    if key is None:
+        key = _GOAL_KEYS[(width, height)] = sliders_pack_tiles(np.arange(width*height))
+    return key
+
+
 def sliders_goal_state(state):
     '''Returns True if we have reached a goal state'''
     '''INPUT: a sliders state'''
     '''OUTPUT: True (if goal) or False (if not)'''  
-    elgoal = np.arange(state.width*state.height)
-    estado_a_probar = state.tiles.reshape(state.width*state.height)
-    if np.array_equal(elgoal,estado_a_probar):
-        return True
-    else :
-        return False
+    #compares the key of the state with the cached key of the goal
+    return state.hashable_state() == sliders_goal_key(state.width, state.height)
 
 
 
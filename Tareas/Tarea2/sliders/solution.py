@@ -18,20 +18,107 @@ def sliders_h_zero(state):
     return 0
 
 def sliders_h_basic(state):
+    tiles = state.tiles
     sum_in_width = 0
     sum_in_height = 0
-    for width in range(state.tiles.shape[0]):
-        correlative = np.arange(np.min(state.tiles[width]), np.min(state.tiles[width])+state.tiles.shape[1], 1)
-        if np.array_equal(state.tiles[width], correlative) is False:
+    for width in range(tiles.shape[0]):
+        correlative = np.arange(np.min(tiles[width]), np.min(tiles[width])+tiles.shape[1], 1)
+        if np.array_equal(tiles[width], correlative) is False:
             sum_in_width += 1
-    for height in range(state.tiles.shape[1]):
-        correlative = np.arange(np.min(state.tiles[:,height]), state.tiles.shape[1]+np.min(state.tiles[:,height])+1, state.tiles.shape[1] )
-        if np.array_equal(state.tiles[:,height], correlative) is False :
+    for height in range(tiles.shape[1]):
+        correlative = np.arange(np.min(tiles[:,height]), tiles.shape[1]+np.min(tiles[:,height])+1, tiles.shape[1] )
+        if np.array_equal(tiles[:,height], correlative) is False :
             sum_in_height += 1
 
     return min(sum_in_width,sum_in_height)  
 
 
+#Batch versions of the heuristics, evaluating all the successors of an
+#expansion at once (see SearchEngine.init_search). They take a stack of
+#boards of shape (k, height, width) and return a vector of k values.
+def sliders_h_zero_batch(tiles):
+    return np.zeros(len(tiles), dtype=int)
+
+def sliders_h_basic_batch(tiles):
+    height, width = tiles.shape[1:]
+    #a row is correlative if it goes up by 1 from its minimum, a column if it
+    #equals the 2 values [minimum, minimum+width] sliders_h_basic compares it
+    #with, so only the columns of boards of height 2 can be correlative
+    rows = tiles != tiles.min(axis=2, keepdims=True) + np.arange(width)
+    if height != 2:
+        return np.minimum(rows.any(axis=2).sum(axis=1), width)
+    columns = tiles != tiles.min(axis=1, keepdims=True) + width*np.arange(height)[:, None]
+    return np.minimum(rows.any(axis=2).sum(axis=1), columns.any(axis=1).sum(axis=1))
+
+sliders_h_zero.batch = lambda states: sliders_h_zero_batch(sliders_stack(states)).tolist()
+sliders_h_basic.batch = lambda states: sliders_h_basic_batch(sliders_stack(states)).tolist()
+
+
+#Incremental version of sliders_h_basic (see SearchEngine.init_search). A row
+#is correlative iff each of its w-1 adjacent pairs goes up by 1, and a column
+#iff its height is 2 (see sliders_h_basic_batch) and its pair goes up by width.
+#The cache keeps the number of such pairs of every row and column, and the
+#number of rows and columns that are not correlative. A slide of a row only
+#changes the pairs of that row and the two vertical pairs of every column that
+#touch the row (and the same for a slide of a column), so the cache is updated
+#in O(width+height).
+def _h_basic_pairs(board, start, step, count):
+    return sum(1 for i in range(start, start + step*(count - 1), step) if board[i + step] - board[i] == (1 if step == 1 else step))
+
+def sliders_h_basic_incremental(state, action, cache):
+    width, height = state.width, state.height
+    #pairs of a correlative column (no column has -1)
+    column_pairs = height - 1 if height == 2 else -1
+    board = state.hashable_state()
+    if cache is None:
+        row_pairs = [_h_basic_pairs(board, r*width, 1, width) for r in range(height)]
+        col_pairs = [_h_basic_pairs(board, c, width, height) for c in range(width)]
+        bad_rows = sum(1 for p in row_pairs if p != width - 1)
+        bad_cols = sum(1 for p in col_pairs if p != column_pairs)
+        return min(bad_rows, bad_cols), (row_pairs, col_pairs, bad_rows, bad_cols)
+
+    parent = state.parent.hashable_state()
+    row_pairs, col_pairs, bad_rows, bad_cols = cache
+    row_pairs = list(row_pairs)
+    col_pairs = list(col_pairs)
+    #the slide is decoded from its code (see sliders_action_code), the action label is not needed
+    code = state.code
+    line = code >> 2
+    if code & 3 < 2:
+        was_bad = row_pairs[line] != width - 1
+        row_pairs[line] = _h_basic_pairs(board, line*width, 1, width)
+        bad_rows = bad_rows - was_bad + (row_pairs[line] != width - 1)
+        #vertical pairs (line-1, line) and (line, line+1) of every column
+        tops = [i*width for i in (line - 1, line) if 0 <= i < height - 1]
+        for c in range(width):
+            delta = 0
+            for top in tops:
+                i = top + c
+                delta = delta + (board[i + width] - board[i] == width) - (parent[i + width] - parent[i] == width)
+            if delta:
+                was_bad = col_pairs[c] != column_pairs
+                col_pairs[c] = col_pairs[c] + delta
+                bad_cols = bad_cols - was_bad + (col_pairs[c] != column_pairs)
+    else:
+        was_bad = col_pairs[line] != column_pairs
+        col_pairs[line] = _h_basic_pairs(board, line, width, height)
+        bad_cols = bad_cols - was_bad + (col_pairs[line] != column_pairs)
+        #horizontal pairs (line-1, line) and (line, line+1) of every row
+        lefts = [i for i in (line - 1, line) if 0 <= i < width - 1]
+        for r in range(height):
+            delta = 0
+            for left in lefts:
+                i = r*width + left
+                delta = delta + (board[i + 1] - board[i] == 1) - (parent[i + 1] - parent[i] == 1)
+            if delta:
+                was_bad = row_pairs[r] != width - 1
+                row_pairs[r] = row_pairs[r] + delta
+                bad_rows = bad_rows - was_bad + (row_pairs[r] != width - 1)
+    return min(bad_rows, bad_cols), (row_pairs, col_pairs, bad_rows, bad_cols)
+
+sliders_h_basic.incremental = sliders_h_basic_incremental
+
+
 def sliders_h_alternate(state):
 #IMPLEMENT
 #----------------------------------------------
@@ -86,7 +173,12 @@ def anytime_weighted_astar(initial_state, heur_fn, weight=1., timebound = 10):
   '''INPUT: a sliders state that represents the start state and a timebound (number of seconds)'''
   '''OUTPUT: A goal state (if a goal is found), else False'''
   '''implementation of weighted astar algorithm'''
-  return False
+  awa_se = SearchEngine('custom', 'full')
+  awa_se.init_search(initial_state, sliders_goal_state, heur_fn, (lambda sN: fval_function(sN, weight)))
+  best = False
+  for goal, cost, elapsed in awa_se.search_anytime(timebound, [weight]):
+    best = goal
+  return best
 
 def restarting_weighted_astar(initial_state, heur_fn, weight=1., phi=0.8, timebound = 10):
 #IMPLEMENT
@@ -95,7 +187,19 @@ def restarting_weighted_astar(initial_state, heur_fn, weight=1., phi=0.8, timebo
   '''INPUT: a sliders state that represents the start state, an heuristic function, an initial weight, a phi parameter and a timebound (number of seconds)'''
   '''OUTPUT: A goal state (if a goal is found), else False'''
   '''implementation of weighted astar algorithm'''
-  return False
+  #weight, weight*phi, weight*phi^2, ... down to 1. Instead of restarting from the
+  #initial state with each new weight, OPEN is re-prioritized and the search goes on.
+  weights = [weight]
+  while phi < 1 and weights[-1]*phi > 1:
+    weights.append(weights[-1]*phi)
+  if weights[-1] > 1:
+    weights.append(1.)
+  rwa_se = SearchEngine('custom', 'full')
+  rwa_se.init_search(initial_state, sliders_goal_state, heur_fn, (lambda sN: fval_function(sN, weight)))
+  best = False
+  for goal, cost, elapsed in rwa_se.search_anytime(timebound, weights):
+    best = goal
+  return best
 
 
 
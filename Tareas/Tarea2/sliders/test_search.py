@@ -0,0 +1,139 @@
+'''Regression tests for the search engine and its tools.
+
+    Usage: python3 -m pytest test_search.py    (from this directory)
+'''
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from solution import *
+
+
+class _GraphState(StateSpace):
+    '''A state of the graph in _GRAPH, named by a letter, with unit costs.'''
+    def __init__(self, action, gval, parent, name):
+        StateSpace.__init__(self, action, gval, parent)
+        self.name = name
+
+    def successors(self):
+        return [_GraphState(name, self.gval + 1, self, name) for name in _GRAPH[self.name]]
+
+    def hashable_state(self):
+        return self.name
+
+    def print_state(self):
+        print(self.name)
+
+#A diamond: D is reached from A by two paths of the same cost.
+_GRAPH = {'A': 'BC', 'B': 'D', 'C': 'D', 'D': 'E', 'E': ''}
+
+
+def _expansions(se):
+    expanded = []
+    se.set_hooks(on_expand=lambda node: expanded.append(node.state.name))
+    se.init_search(_GraphState('START', 0, None, 'A'), lambda state: state.name == 'E')
+    final = se.search(timebound=10)
+    return final.gval, expanded
+
+
+def _search(se, state=None):
+    se.init_search(state if state is not None else PROBLEMS[3], sliders_goal_state, sliders_h_basic)
+    return se.search(timebound=10)
+
+
+def test_trace_on_zero_is_trace_off(capsys, monkeypatch):
+    se = SearchEngine('astar', 'full')
+    se.trace_off()
+    off = _search(se)
+    off_output = capsys.readouterr().out
+
+    se = SearchEngine('astar', 'full')
+    se.trace_on(0)
+    assert se.tracer is None
+    def observed(*args):
+        raise AssertionError('trace_on(0) must use the fast search loop')
+    monkeypatch.setattr(se, '_searchOpenObserved', observed)
+    on = _search(se)
+    assert capsys.readouterr().out == off_output
+    assert 'TRACE' not in off_output
+    assert on.gval == off.gval
+
+
+def test_tracer_level_zero_prints_nothing(capsys):
+    se = SearchEngine('astar', 'full')
+    se.trace_on(0, SearchTracer(0))
+    _search(se)
+    assert 'TRACE' not in capsys.readouterr().out
+
+
+def test_duplicates_expanded_by_default():
+    gval, expanded = _expansions(SearchEngine('ucs', 'full'))
+    assert gval == 3
+    assert expanded.count('D') == 2
+
+
+def test_skip_duplicates_on():
+    se = SearchEngine('ucs', 'full')
+    se.skip_duplicates_on()
+    gval, expanded = _expansions(se)
+    assert gval == 3
+    assert expanded.count('D') == 1
+    assert se.stats.duplicate_pops + se.cycle_check_pruned >= 1
+
+
+def test_skip_duplicates_fast_loop():
+    counts = []
+    for skip in (False, True):
+        se = SearchEngine('ucs', 'full')
+        if skip:
+            se.skip_duplicates_on()
+        se.init_search(_GraphState('START', 0, None, 'A'), lambda state: state.name == 'E')
+        se.search(timebound=10)
+        counts.append(se.stats.expanded)
+    assert counts == [5, 4]
+
+
+def test_h_basic_versions_agree():
+    #rows out of order but columns going up by width: only boards of height 2
+    #can have correlative columns in sliders_h_basic
+    state = SlidersState("START", 0, None, 3, 3, np.array([[1, 2, 0], [4, 5, 3], [7, 8, 6]]))
+    assert sliders_h_basic(state) == 3
+    rng = np.random.default_rng(0)
+    for start in PROBLEMS:
+        state = start
+        h, cache = sliders_h_basic.incremental(state, None, None)
+        for step in range(50):
+            assert h == sliders_h_basic(state)
+            successors = state.successors()
+            assert sliders_h_basic.batch(successors) == [sliders_h_basic(succ) for succ in successors]
+            state = successors[rng.integers(len(successors))]
+            h, cache = sliders_h_basic.incremental(state, state.action, cache)
+
+
+def test_compare_baseline_with_missing_columns(tmp_path):
+    import benchmark
+    #written before expanded, generated and cpu_time were columns
+    path = str(tmp_path / 'old.csv')
+    with open(path, 'w') as f:
+        f.write('suite,problem,strategy,weight,heuristic,solved,cost,nodes,wall_time\n')
+        f.write('sliders,3,astar,,basic,True,3,10,0.01\n')
+    baseline = benchmark.read_results(path)
+    assert baseline[0]['expanded'] is None and baseline[0]['cpu_time'] is None
+    row = benchmark.run_one(('sliders', 3, 'astar', None, 'basic', 10, 'lazy', False, None, False))
+    assert benchmark.compare([row], baseline) == []
+    row = dict(row, cost=row['cost'] + 1)
+    assert len(benchmark.compare([row], baseline)) == 1
+
+
+def test_bucket_frontier_pops_like_lazy_heap():
+    for strategy in ('ucs', 'astar'):
+        orders = []
+        for frontier in ('lazy', 'bucket'):
+            se = SearchEngine(strategy, 'full', frontier)
+            expanded = []
+            se.set_hooks(on_expand=lambda node: expanded.append(node.state.hashable_state()))
+            final = _search(se)
+            orders.append((final.gval, expanded))
+        assert orders[0] == orders[1]